@@ -55,11 +55,22 @@ class TraceAnalyzer:
             for turn in session.turns
         )
         
-        # Token usage
+        # Token usage, summed as ints and wrapped in one TokenUsage at the end
+        input_tokens = output_tokens = cache_read = cache_creation = 0
         for turn in session.turns:
             for msg in turn.assistant_messages:
-                if msg.usage:
-                    stats.total_tokens = stats.total_tokens + msg.usage
+                usage = msg.usage
+                if usage:
+                    input_tokens += usage.input_tokens
+                    output_tokens += usage.output_tokens
+                    cache_read += usage.cache_read_tokens
+                    cache_creation += usage.cache_creation_tokens
+        stats.total_tokens = TokenUsage(
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cache_read_tokens=cache_read,
+            cache_creation_tokens=cache_creation
+        )
         
         # Tool usage breakdown
         tool_stats = defaultdict(lambda: ToolStats(tool_name=""))
@@ -164,29 +175,33 @@ class TraceAnalyzer:
             return {"error": "No storage configured"}
         
         summary = self.storage.get_otel_summary(session_id)
-        metrics = self.storage.get_otel_metrics(session_id)
-        
         if not summary:
             return {"available": False, "message": "No OTEL metrics for this session"}
         
-        # Group metrics by name
-        metrics_by_name = defaultdict(list)
-        for m in metrics:
-            metrics_by_name[m['metric_name']].append(m)
-        
-        # Calculate statistics per metric
+        # Accumulate statistics per metric while streaming the data points
         metrics_analysis = {}
-        for name, data_points in metrics_by_name.items():
-            values = [dp['metric_value'] for dp in data_points]
-            metrics_analysis[name] = {
-                "count": len(values),
-                "total": sum(values),
-                "avg": sum(values) / len(values) if values else 0,
-                "min": min(values) if values else 0,
-                "max": max(values) if values else 0,
-                "type": data_points[0].get('metric_type', 'counter') if data_points else 'counter',
-                "unit": data_points[0].get('unit', '') if data_points else ''
-            }
+        for m in self.storage.iter_otel_metrics(session_id):
+            value = m['metric_value']
+            stats = metrics_analysis.get(m['metric_name'])
+            if stats is None:
+                metrics_analysis[m['metric_name']] = {
+                    "count": 1,
+                    "total": value,
+                    "avg": 0,
+                    "min": value,
+                    "max": value,
+                    "type": m.get('metric_type', 'counter'),
+                    "unit": m.get('unit', '')
+                }
+                continue
+            stats["count"] += 1
+            stats["total"] += value
+            if value < stats["min"]:
+                stats["min"] = value
+            if value > stats["max"]:
+                stats["max"] = value
+        for stats in metrics_analysis.values():
+            stats["avg"] = stats["total"] / stats["count"]
         
         return {
             "available": True,
@@ -323,26 +338,26 @@ class TraceAnalyzer:
         Returns:
             Tool analysis with statistics and details
         """
-        all_tools = session.get_all_tool_uses()
-        
-        if tool_name:
-            all_tools = [t for t in all_tools if t.tool_name == tool_name]
-        
-        # Compute stats
+        # Group straight from the turns, filtering as we go, instead of
+        # building the flat get_all_tool_uses() list first
         by_name = defaultdict(list)
-        for tool in all_tools:
-            by_name[tool.tool_name].append(tool)
+        for turn in session.turns:
+            for tool in turn.tool_uses:
+                if not tool_name or tool.tool_name == tool_name:
+                    by_name[tool.tool_name].append(tool)
         
         analysis = {
-            "total_calls": len(all_tools),
+            "total_calls": sum(len(tools) for tools in by_name.values()),
             "unique_tools": len(by_name),
             "tools": {}
         }
         
         for name, tools in by_name.items():
-            durations = [t.duration_ms for t in tools if t.duration_ms]
+            # duration_ms is a computed property; evaluate it once per call
+            tool_durations = [t.duration_ms for t in tools]
+            durations = [d for d in tool_durations if d]
             successes = sum(1 for t in tools if t.success)
-            errors = sum(1 for t in tools if not t.success)
+            errors = len(tools) - successes
             
             analysis["tools"][name] = {
                 "call_count": len(tools),
@@ -358,11 +373,11 @@ class TraceAnalyzer:
                         "tool_id": t.tool_id,
                         "input": t.input_data,
                         "output_preview": (t.output_data or "")[:100],
-                        "duration_ms": t.duration_ms,
+                        "duration_ms": duration_ms,
                         "success": t.success,
                         "error": t.error
                     }
-                    for t in tools
+                    for t, duration_ms in zip(tools, tool_durations)
                 ]
             }
         
@@ -378,66 +393,63 @@ class TraceAnalyzer:
         Returns:
             Token analysis with breakdown by turn and model
         """
-        analysis = {
-            "total": {
-                "input": 0,
-                "output": 0,
-                "cache_read": 0,
-                "cache_creation": 0,
-                "total": 0
-            },
-            "by_turn": [],
-            "by_model": defaultdict(lambda: {
-                "input": 0, "output": 0, "calls": 0
-            }),
-            "cache_analysis": {
-                "hit_rate": 0,
-                "tokens_saved": 0
-            }
-        }
-        
-        total_cache_read = 0
-        total_input = 0
+        # Running totals are plain ints; summing TokenUsage objects would
+        # build a new one for every message
+        total_input = total_output = total_cache_read = total_cache_creation = 0
+        by_turn = []
+        by_model: Dict[str, Dict[str, int]] = {}
         
         for turn in session.turns:
-            turn_tokens = TokenUsage()
+            turn_input = turn_output = turn_cache_read = turn_cache_creation = 0
             for msg in turn.assistant_messages:
-                if msg.usage:
-                    turn_tokens = turn_tokens + msg.usage
-                    analysis["by_model"][msg.model or "unknown"]["input"] += msg.usage.input_tokens
-                    analysis["by_model"][msg.model or "unknown"]["output"] += msg.usage.output_tokens
-                    analysis["by_model"][msg.model or "unknown"]["calls"] += 1
+                usage = msg.usage
+                if usage:
+                    turn_input += usage.input_tokens
+                    turn_output += usage.output_tokens
+                    turn_cache_read += usage.cache_read_tokens
+                    turn_cache_creation += usage.cache_creation_tokens
+                    
+                    model_stats = by_model.get(msg.model or "unknown")
+                    if model_stats is None:
+                        model_stats = by_model[msg.model or "unknown"] = {
+                            "input": 0, "output": 0, "calls": 0
+                        }
+                    model_stats["input"] += usage.input_tokens
+                    model_stats["output"] += usage.output_tokens
+                    model_stats["calls"] += 1
             
-            analysis["by_turn"].append({
+            by_turn.append({
                 "turn_number": turn.turn_number,
-                "input": turn_tokens.input_tokens,
-                "output": turn_tokens.output_tokens,
-                "cache_read": turn_tokens.cache_read_tokens,
-                "cache_creation": turn_tokens.cache_creation_tokens,
-                "total": turn_tokens.total_tokens
+                "input": turn_input,
+                "output": turn_output,
+                "cache_read": turn_cache_read,
+                "cache_creation": turn_cache_creation,
+                "total": turn_input + turn_output
             })
             
-            analysis["total"]["input"] += turn_tokens.input_tokens
-            analysis["total"]["output"] += turn_tokens.output_tokens
-            analysis["total"]["cache_read"] += turn_tokens.cache_read_tokens
-            analysis["total"]["cache_creation"] += turn_tokens.cache_creation_tokens
-            
-            total_cache_read += turn_tokens.cache_read_tokens
-            total_input += turn_tokens.input_tokens
-        
-        analysis["total"]["total"] = (
-            analysis["total"]["input"] + analysis["total"]["output"]
-        )
+            total_input += turn_input
+            total_output += turn_output
+            total_cache_read += turn_cache_read
+            total_cache_creation += turn_cache_creation
         
         # Cache analysis
+        cache_analysis = {"hit_rate": 0, "tokens_saved": 0}
         if total_input > 0:
-            analysis["cache_analysis"]["hit_rate"] = (total_cache_read / total_input) * 100
-            analysis["cache_analysis"]["tokens_saved"] = total_cache_read
-        
-        # Convert defaultdict to dict
-        analysis["by_model"] = dict(analysis["by_model"])
+            cache_analysis["hit_rate"] = (total_cache_read / total_input) * 100
+            cache_analysis["tokens_saved"] = total_cache_read
         
-        return analysis
+        return {
+            "total": {
+                "input": total_input,
+                "output": total_output,
+                "cache_read": total_cache_read,
+                "cache_creation": total_cache_creation,
+                "total": total_input + total_output
+            },
+            "by_turn": by_turn,
+            "by_model": by_model,
+            "cache_analysis": cache_analysis
+        }
     
     def get_time_breakdown(self, session: Session) -> Dict[str, Any]:
         """
@@ -15,6 +15,7 @@ from claude_trace.analyzer import TraceAnalyzer
 from claude_trace.collector import TraceCollector
 from claude_trace.reporter import TraceReporter
 from claude_trace.storage import TraceStorage
+from claude_trace.utils import format_duration
 
 
 def get_storage() -> TraceStorage:
@@ -141,7 +142,13 @@ def cmd_stats(args) -> int:
         print("")
         print("Tool Usage:")
         for name, stats in tool_stats.items():
-            print(f"  {name}: {stats.call_count} calls, {stats.success_rate:.1f}% success")
+            line = f"  {name}: {stats.call_count} calls, {stats.success_rate:.1f}% success"
+            if stats.p50_duration_ms is not None:
+                line += (
+                    f", p50 {format_duration(int(stats.p50_duration_ms))}"
+                    f", p95 {format_duration(int(stats.p95_duration_ms))}"
+                )
+            print(line)
     else:
         session = storage.get_session(args.session_id)
         
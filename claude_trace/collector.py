@@ -6,9 +6,10 @@ Parses JSONL transcript files from Claude Code and extracts structured trace dat
 
 import json
 import os
+from itertools import islice
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Iterator, List, Optional, Tuple
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
 
 from claude_trace.models import (
     ContentBlock,
@@ -20,7 +21,12 @@ from claude_trace.models import (
     ToolUse,
     Turn,
 )
-from claude_trace.utils import generate_id, get_nested, parse_timestamp
+from claude_trace.utils import generate_id, json_loads, make_getter, parse_timestamp
+
+
+# Paths read from every assistant transcript entry
+_get_message_id = make_getter("message", "id")
+_get_message_content = make_getter("message", "content")
 
 
 class TraceCollector:
@@ -35,6 +41,9 @@ class TraceCollector:
         """
         self.storage = storage
         self._pending_tool_uses: Dict[str, ToolUse] = {}  # tool_use_id -> ToolUse
+        # transcript path -> (line count, byte offset) where the last
+        # collect_incremental() read stopped, so the next call can seek there
+        self._line_offsets: Dict[str, Tuple[int, int]] = {}
     
     def collect_from_file(
         self, 
@@ -99,6 +108,12 @@ class TraceCollector:
         """
         Collect trace data incrementally from new lines in transcript.
         
+        Calls that continue from the line the previous call on the same
+        file returned seek straight to its byte offset, so tailing a
+        growing transcript reads only the new lines. Other line numbers,
+        or a file that no longer matches the saved offset, are found by
+        counting lines from the start.
+        
         Args:
             transcript_path: Path to the JSONL transcript file
             session_id: Session ID
@@ -113,20 +128,19 @@ class TraceCollector:
         
         # Read new lines
         new_messages = []
-        current_line = 0
         
-        with open(path, 'r') as f:
+        with open(path, 'rb') as f:
+            current_line = self._seek_to_line(f, str(path), last_line)
             for line in f:
                 current_line += 1
-                if current_line <= last_line:
-                    continue
                 line = line.strip()
                 if line:
                     try:
-                        data = json.loads(line)
+                        data = json_loads(line)
                         new_messages.append(data)
                     except json.JSONDecodeError:
                         continue
+            self._line_offsets[str(path)] = (current_line, f.tell())
         
         if not new_messages:
             # Return existing session if available
@@ -167,14 +181,37 @@ class TraceCollector:
         
         return session, current_line
     
+    def _seek_to_line(self, f: BinaryIO, path: str, last_line: int) -> int:
+        """
+        Position a transcript opened in binary mode after its first
+        last_line lines.
+        
+        Returns:
+            Number of lines skipped, less than last_line if the file is shorter
+        """
+        saved = self._line_offsets.get(path)
+        if saved is not None and saved[0] == last_line and 0 < saved[1]:
+            # Trust the saved offset only if it still ends a line
+            line_count, offset = saved
+            f.seek(offset - 1)
+            if f.read(1) == b"\n":
+                return line_count
+            f.seek(0)
+        return sum(1 for _ in islice(f, last_line))
+    
     def _parse_jsonl(self, path: str) -> Iterator[Dict[str, Any]]:
-        """Parse JSONL file and yield message dictionaries."""
-        with open(path, 'r') as f:
+        """
+        Parse JSONL file and yield message dictionaries.
+        
+        Lines are read as bytes and decoded by the JSON parser itself,
+        which skips a separate UTF-8 decode per line.
+        """
+        with open(path, 'rb') as f:
             for line in f:
                 line = line.strip()
                 if line:
                     try:
-                        yield json.loads(line)
+                        yield json_loads(line)
                     except json.JSONDecodeError:
                         continue
     
@@ -232,7 +269,7 @@ class TraceCollector:
             
             elif role == "assistant" and current_turn:
                 # Accumulate assistant message parts (for SSE streaming)
-                msg_id = get_nested(msg_data, "message", "id") or generate_id()
+                msg_id = _get_message_id(msg_data) or generate_id()
                 if msg_id not in current_assistant_parts:
                     current_assistant_parts[msg_id] = []
                 current_assistant_parts[msg_id].append(msg_data)
@@ -278,7 +315,7 @@ class TraceCollector:
         if isinstance(content, str):
             content_blocks = [ContentBlock(type=ContentType.TEXT, text=content)]
         elif isinstance(content, list):
-            content_blocks = [ContentBlock.from_dict(c) for c in content]
+            content_blocks = ContentBlock.from_dicts(content)
         
         return Message(
             message_id=generate_id(),
@@ -304,14 +341,16 @@ class TraceCollector:
         last_part = parts[-1]
         msg = last_part.get("message", {})
         
-        message_id = msg.get("id", generate_id())
+        # Only generate an id when the message has none; a default argument
+        # to get() would build a UUID for every message
+        message_id = msg["id"] if "id" in msg else generate_id()
         model = msg.get("model")
         timestamp = parse_timestamp(last_part.get("timestamp", ""))
         
         # Merge content from all parts
         all_content = []
         for part in parts:
-            part_content = get_nested(part, "message", "content") or []
+            part_content = _get_message_content(part) or []
             if isinstance(part_content, list):
                 all_content.extend(part_content)
             elif isinstance(part_content, str):
@@ -5,12 +5,18 @@ These dataclasses represent the structured trace data collected from
 Claude Code sessions.
 """
 
+import sys
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 from enum import Enum
 
 
+# Records built in bulk when loading sessions use __slots__ (Python 3.10+)
+# to drop the per-instance __dict__
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
 class MessageRole(str, Enum):
     """Role of a message in the conversation."""
     USER = "user"
@@ -25,7 +31,7 @@ class ContentType(str, Enum):
     TOOL_RESULT = "tool_result"
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class ContentBlock:
     """A single content block within a message."""
     type: ContentType
@@ -39,36 +45,47 @@ class ContentBlock:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "ContentBlock":
         """Create ContentBlock from a dictionary."""
-        block_type = data.get("type", "text")
-        
-        if block_type == "text":
-            return cls(
-                type=ContentType.TEXT,
-                text=data.get("text", "")
-            )
-        elif block_type == "thinking":
-            return cls(
-                type=ContentType.THINKING,
-                thinking=data.get("thinking", "")
-            )
-        elif block_type == "tool_use":
-            return cls(
-                type=ContentType.TOOL_USE,
-                tool_use_id=data.get("id"),
-                tool_name=data.get("name"),
-                tool_input=data.get("input", {})
-            )
-        elif block_type == "tool_result":
-            return cls(
-                type=ContentType.TOOL_RESULT,
-                tool_use_id=data.get("tool_use_id"),
-                tool_result=str(data.get("content", ""))
-            )
-        else:
+        parse = _CONTENT_BLOCK_PARSERS.get(data.get("type", "text"))
+        if parse is None:
             return cls(type=ContentType.TEXT, text=str(data))
+        return parse(data)
+    
+    @classmethod
+    def from_dicts(cls, items: List[Dict[str, Any]]) -> List["ContentBlock"]:
+        """Create ContentBlocks from a list of dictionaries."""
+        parsers = _CONTENT_BLOCK_PARSERS
+        blocks = []
+        for item in items:
+            parse = parsers.get(item.get("type", "text"))
+            if parse is None:
+                blocks.append(cls(type=ContentType.TEXT, text=str(item)))
+            else:
+                blocks.append(parse(item))
+        return blocks
 
 
-@dataclass
+# Builders for each content block type in transcript data, looked up once per
+# block instead of testing the type against every branch
+_CONTENT_BLOCK_PARSERS: Dict[str, Callable[[Dict[str, Any]], ContentBlock]] = {
+    "text": lambda d: ContentBlock(type=ContentType.TEXT, text=d.get("text", "")),
+    "thinking": lambda d: ContentBlock(
+        type=ContentType.THINKING, thinking=d.get("thinking", "")
+    ),
+    "tool_use": lambda d: ContentBlock(
+        type=ContentType.TOOL_USE,
+        tool_use_id=d.get("id"),
+        tool_name=d.get("name"),
+        tool_input=d.get("input", {})
+    ),
+    "tool_result": lambda d: ContentBlock(
+        type=ContentType.TOOL_RESULT,
+        tool_use_id=d.get("tool_use_id"),
+        tool_result=str(d.get("content", ""))
+    ),
+}
+
+
+@dataclass(**_SLOTS)
 class TokenUsage:
     """Token usage statistics for a message or session."""
     input_tokens: int = 0
@@ -110,7 +127,7 @@ class TokenUsage:
         )
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class Message:
     """A single message in the conversation."""
     message_id: str
@@ -141,7 +158,7 @@ class Message:
         return any(b.type == ContentType.TOOL_USE for b in self.content)
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class ToolUse:
     """A tool use instance with timing and result information."""
     tool_id: str
@@ -176,6 +193,11 @@ class ToolStats:
     total_duration_ms: int = 0
     success_count: int = 0
     error_count: int = 0
+    # Latency distribution over calls with a known duration
+    min_duration_ms: Optional[int] = None
+    max_duration_ms: Optional[int] = None
+    p50_duration_ms: Optional[float] = None
+    p95_duration_ms: Optional[float] = None
     
     @property
     def avg_duration_ms(self) -> float:
@@ -192,7 +214,7 @@ class ToolStats:
         return (self.success_count / self.call_count) * 100
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class Turn:
     """A single conversation turn (user input + assistant response(s))."""
     turn_id: str
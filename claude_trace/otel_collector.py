@@ -18,6 +18,8 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+from claude_trace.utils import json_loads
+
 
 @dataclass
 class OtelMetricDataPoint:
@@ -256,7 +258,7 @@ class OtelMetricsParser:
                 continue
             
             try:
-                data = json.loads(line)
+                data = json_loads(line)
                 metric = self._parse_json_metric(data)
                 if metric:
                     if metric.name in metrics:
@@ -4,15 +4,23 @@ SQLite storage layer for Claude Code local tracing.
 Provides persistent storage for trace data in a local SQLite database.
 """
 
-import json
+import atexit
 import os
+import queue
+import re
 import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from dataclasses import fields
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 
 from claude_trace.models import (
     ContentBlock,
+    ContentType,
     Message,
     MessageRole,
     Session,
@@ -22,7 +30,858 @@ from claude_trace.models import (
     ToolUse,
     Turn,
 )
-from claude_trace.utils import parse_timestamp
+from claude_trace.utils import (
+    from_epoch_us,
+    json_dumps,
+    json_loads,
+    parse_timestamp,
+    to_epoch_us,
+)
+
+
+# Version of the on-disk schema, stored in PRAGMA user_version. Bump it
+# whenever the layout changes and register a migration in _MIGRATIONS.
+SCHEMA_VERSION = 12
+
+# Definitions of tables that migrations rebuild, with a {table} placeholder
+# for the name. Rows belonging to a session are removed with it through
+# ON DELETE CASCADE; OTEL rows may arrive before their session is stored,
+# so they carry no foreign key.
+_TURNS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        turn_id TEXT PRIMARY KEY,
+        session_id TEXT NOT NULL,
+        turn_number INTEGER NOT NULL,
+        start_time INTEGER,
+        end_time INTEGER,
+        duration_ms INTEGER,
+        FOREIGN KEY (session_id) REFERENCES sessions(session_id)
+            ON DELETE CASCADE
+    )
+"""
+
+_MESSAGES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        message_id TEXT PRIMARY KEY,
+        turn_id TEXT NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT,
+        model_id INTEGER,
+        timestamp INTEGER NOT NULL,
+        input_tokens INTEGER,
+        output_tokens INTEGER,
+        cache_read_tokens INTEGER,
+        cache_creation_tokens INTEGER,
+        raw_data TEXT,
+        FOREIGN KEY (turn_id) REFERENCES turns(turn_id) ON DELETE CASCADE,
+        FOREIGN KEY (model_id) REFERENCES models(model_id)
+    )
+"""
+
+_TOOL_USES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        tool_id TEXT PRIMARY KEY,
+        turn_id TEXT NOT NULL,
+        message_id TEXT,
+        tool_name_id INTEGER NOT NULL,
+        input_data TEXT,
+        output_data TEXT,
+        start_time INTEGER,
+        end_time INTEGER,
+        duration_ms INTEGER,
+        success INTEGER DEFAULT 1,
+        error TEXT,
+        session_id TEXT,
+        FOREIGN KEY (turn_id) REFERENCES turns(turn_id) ON DELETE CASCADE,
+        FOREIGN KEY (message_id) REFERENCES messages(message_id)
+            ON DELETE SET NULL,
+        FOREIGN KEY (tool_name_id) REFERENCES tool_names(tool_name_id),
+        FOREIGN KEY (session_id) REFERENCES sessions(session_id)
+            ON DELETE CASCADE
+    )
+"""
+
+_OTEL_METRICS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        metric_def_id INTEGER NOT NULL,
+        metric_value REAL NOT NULL,
+        attributes TEXT,
+        timestamp INTEGER,
+        timestamp_text TEXT,
+        collected_at TEXT NOT NULL,
+        FOREIGN KEY (metric_def_id) REFERENCES otel_metric_defs(metric_def_id)
+    )
+"""
+
+# Per-metric fields that are identical for every data point of a metric
+_OTEL_METRIC_DEFS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS otel_metric_defs (
+        metric_def_id INTEGER PRIMARY KEY,
+        metric_name TEXT NOT NULL UNIQUE,
+        metric_type TEXT DEFAULT 'counter',
+        unit TEXT,
+        description TEXT
+    )
+"""
+
+_OTEL_SUMMARY_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        session_id TEXT PRIMARY KEY,
+        input_tokens INTEGER DEFAULT 0,
+        output_tokens INTEGER DEFAULT 0,
+        cache_read_tokens INTEGER DEFAULT 0,
+        cache_creation_tokens INTEGER DEFAULT 0,
+        api_calls INTEGER DEFAULT 0,
+        api_latency_ms REAL DEFAULT 0,
+        tool_calls INTEGER DEFAULT 0,
+        errors INTEGER DEFAULT 0,
+        raw_output TEXT,
+        collected_at TEXT
+    )
+"""
+
+
+# Running totals over otel_session_summary, kept in a single row by the
+# triggers below so get_aggregate_otel_metrics does not scan every session.
+# api_latency_count counts non-NULL latencies, to average them like AVG().
+_OTEL_TOTALS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS otel_global_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        input_tokens INTEGER NOT NULL DEFAULT 0,
+        output_tokens INTEGER NOT NULL DEFAULT 0,
+        cache_read_tokens INTEGER NOT NULL DEFAULT 0,
+        cache_creation_tokens INTEGER NOT NULL DEFAULT 0,
+        api_calls INTEGER NOT NULL DEFAULT 0,
+        api_latency_ms REAL NOT NULL DEFAULT 0,
+        api_latency_count INTEGER NOT NULL DEFAULT 0,
+        tool_calls INTEGER NOT NULL DEFAULT 0,
+        errors INTEGER NOT NULL DEFAULT 0,
+        session_count INTEGER NOT NULL DEFAULT 0
+    )
+"""
+
+# otel_session_summary columns summed into otel_global_totals
+_OTEL_TOTAL_COLUMNS = (
+    "input_tokens", "output_tokens", "cache_read_tokens",
+    "cache_creation_tokens", "api_calls", "api_latency_ms", "tool_calls",
+    "errors",
+)
+
+
+def _otel_totals_trigger_sql(event: str) -> str:
+    """Build the trigger applying one otel_session_summary change to the totals."""
+    # Inserted rows are added, deleted rows subtracted, updates do both
+    rows = {
+        "INSERT": (("+", "NEW"),),
+        "UPDATE": (("+", "NEW"), ("-", "OLD")),
+        "DELETE": (("-", "OLD"),),
+    }[event]
+    terms = {
+        column: [f"COALESCE({row}.{column}, 0)" for _, row in rows]
+        for column in _OTEL_TOTAL_COLUMNS
+    }
+    terms["api_latency_count"] = [
+        f"({row}.api_latency_ms IS NOT NULL)" for _, row in rows
+    ]
+    if event != "UPDATE":
+        terms["session_count"] = ["1"]
+    assignments = ",\n            ".join(
+        column + " = " + column + "".join(
+            f" {sign} {term}" for (sign, _), term in zip(rows, values)
+        )
+        for column, values in terms.items()
+    )
+    return f"""
+        CREATE TRIGGER IF NOT EXISTS trg_otel_totals_{event.lower()}
+        AFTER {event} ON otel_session_summary
+        BEGIN
+            UPDATE otel_global_totals SET
+            {assignments}
+            WHERE id = 1;
+        END
+    """
+
+
+_OTEL_TOTALS_TRIGGERS_SQL = tuple(
+    _otel_totals_trigger_sql(event) for event in ("INSERT", "UPDATE", "DELETE")
+)
+
+
+def _isoformat_us(value: Optional[int]) -> Optional[str]:
+    """Format an epoch-microseconds column value as an ISO 8601 string."""
+    dt = from_epoch_us(value)
+    return dt.isoformat() if dt else None
+
+
+def _otel_epoch_us(timestamp: str) -> Optional[int]:
+    """
+    Convert an OTEL data point timestamp to epoch microseconds for sorting.
+    
+    Timestamps with a UTC offset are converted to UTC; naive ones, such as
+    the local times written by OtelMetricsParser, are stored as-is.
+    """
+    try:
+        dt = datetime.fromisoformat(timestamp)
+    except ValueError:
+        dt = None
+    if dt is None or dt.tzinfo is None:
+        dt = parse_timestamp(timestamp)
+    return to_epoch_us(dt)
+
+
+# Payload columns (message content/raw_data, tool input/output) at least this
+# long are stored as zlib-compressed BLOBs; shorter values stay TEXT, as do
+# rows written before compression was introduced.
+_COMPRESS_MIN_LENGTH = 512
+_COMPRESS_LEVEL = 3
+
+
+def _compress_text(text: Optional[str]) -> Union[str, bytes, None]:
+    """Compress a large payload for storage; small values are kept as-is."""
+    if text is None or len(text) < _COMPRESS_MIN_LENGTH:
+        return text
+    return zlib.compress(text.encode("utf-8"), _COMPRESS_LEVEL)
+
+
+def _decompress_text(value: Union[str, bytes, None]) -> Optional[str]:
+    """Restore a payload column value written by _compress_text()."""
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value
+
+
+def _migrate_to_v1(cursor: sqlite3.Cursor) -> None:
+    """Convert ISO 8601 TEXT timestamp columns to INTEGER epoch microseconds."""
+    timestamp_columns = ("start_time", "end_time", "timestamp")
+    for table in ("sessions", "turns", "messages", "tool_uses", "otel_metrics"):
+        cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (table,)
+        )
+        row = cursor.fetchone()
+        if not row:
+            continue
+        
+        # Rebuild the table from its own definition with the new column types.
+        # Missing start times used to be stored as "", so they become NULL.
+        create_sql = re.sub(
+            r"\b(start_time|end_time) TEXT( NOT NULL)?", r"\1 INTEGER", row[0]
+        )
+        create_sql = re.sub(r"\btimestamp TEXT\b", "timestamp INTEGER", create_sql)
+        create_sql = create_sql.replace(
+            f"CREATE TABLE {table}", f"CREATE TABLE {table}_v1", 1
+        )
+        cursor.execute(create_sql)
+        
+        cursor.execute(f"SELECT * FROM {table}")
+        columns = [d[0] for d in cursor.description]
+        converted = [
+            i for i, name in enumerate(columns) if name in timestamp_columns
+        ]
+        rows = []
+        for old_row in cursor.fetchall():
+            new_row = list(old_row)
+            for i in converted:
+                value = new_row[i]
+                new_row[i] = to_epoch_us(parse_timestamp(value)) if value else None
+            rows.append(new_row)
+        
+        placeholders = ", ".join("?" for _ in columns)
+        cursor.executemany(
+            f"INSERT INTO {table}_v1 ({', '.join(columns)}) VALUES ({placeholders})",
+            rows
+        )
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f"ALTER TABLE {table}_v1 RENAME TO {table}")
+
+
+def _table_exists(cursor: sqlite3.Cursor, table: str) -> bool:
+    """Check whether a table exists in the database."""
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (table,)
+    )
+    return cursor.fetchone() is not None
+
+
+def _rebuild_table(
+    cursor: sqlite3.Cursor,
+    table: str,
+    create_sql: str,
+    columns: str,
+    select_exprs: str
+) -> None:
+    """
+    Recreate a table with a new definition, copying its rows across.
+    
+    Args:
+        cursor: Cursor inside the migration transaction
+        table: Name of the table to rebuild
+        create_sql: CREATE TABLE statement with a {table} placeholder
+        columns: Comma-separated column list of the new table
+        select_exprs: Expressions selecting those columns from the old table
+    """
+    cursor.execute(create_sql.format(table=f"{table}_new"))
+    cursor.execute(
+        f"INSERT INTO {table}_new ({columns}) SELECT {select_exprs} FROM {table}"
+    )
+    cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+
+
+def _migrate_to_v2(cursor: sqlite3.Cursor) -> None:
+    """Move model and tool names into the models/tool_names lookup tables."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS models (
+            model_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tool_names (
+            tool_name_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+    """)
+    
+    if _table_exists(cursor, "messages"):
+        cursor.execute("""
+            INSERT OR IGNORE INTO models (name)
+            SELECT DISTINCT model FROM messages WHERE model IS NOT NULL
+        """)
+        _rebuild_table(
+            cursor,
+            "messages",
+            """
+            CREATE TABLE {table} (
+                message_id TEXT PRIMARY KEY,
+                turn_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT,
+                model_id INTEGER,
+                timestamp INTEGER NOT NULL,
+                input_tokens INTEGER,
+                output_tokens INTEGER,
+                cache_read_tokens INTEGER,
+                cache_creation_tokens INTEGER,
+                raw_data TEXT,
+                FOREIGN KEY (turn_id) REFERENCES turns(turn_id),
+                FOREIGN KEY (model_id) REFERENCES models(model_id)
+            )
+            """,
+            "message_id, turn_id, role, content, model_id, timestamp, "
+            "input_tokens, output_tokens, cache_read_tokens, "
+            "cache_creation_tokens, raw_data",
+            "message_id, turn_id, role, content, "
+            "(SELECT model_id FROM models WHERE name = model), timestamp, "
+            "input_tokens, output_tokens, cache_read_tokens, "
+            "cache_creation_tokens, raw_data"
+        )
+    
+    if _table_exists(cursor, "tool_uses"):
+        cursor.execute("""
+            INSERT OR IGNORE INTO tool_names (name)
+            SELECT DISTINCT tool_name FROM tool_uses
+        """)
+        cursor.execute("DROP INDEX IF EXISTS idx_tool_uses_name")
+        _rebuild_table(
+            cursor,
+            "tool_uses",
+            """
+            CREATE TABLE {table} (
+                tool_id TEXT PRIMARY KEY,
+                turn_id TEXT NOT NULL,
+                message_id TEXT,
+                tool_name_id INTEGER NOT NULL,
+                input_data TEXT,
+                output_data TEXT,
+                start_time INTEGER,
+                end_time INTEGER,
+                duration_ms INTEGER,
+                success INTEGER DEFAULT 1,
+                error TEXT,
+                FOREIGN KEY (turn_id) REFERENCES turns(turn_id),
+                FOREIGN KEY (message_id) REFERENCES messages(message_id),
+                FOREIGN KEY (tool_name_id) REFERENCES tool_names(tool_name_id)
+            )
+            """,
+            "tool_id, turn_id, message_id, tool_name_id, input_data, "
+            "output_data, start_time, end_time, duration_ms, success, error",
+            "tool_id, turn_id, message_id, "
+            "(SELECT tool_name_id FROM tool_names WHERE name = tool_name), "
+            "input_data, output_data, start_time, end_time, duration_ms, "
+            "success, error"
+        )
+
+
+def _migrate_to_v3(cursor: sqlite3.Cursor) -> None:
+    """Denormalize session_id onto tool_uses so stats skip the turns JOIN."""
+    if not _table_exists(cursor, "tool_uses"):
+        return
+    cursor.execute("""
+        ALTER TABLE tool_uses
+        ADD COLUMN session_id TEXT REFERENCES sessions(session_id)
+    """)
+    cursor.execute("""
+        UPDATE tool_uses
+        SET session_id = (
+            SELECT t.session_id FROM turns t WHERE t.turn_id = tool_uses.turn_id
+        )
+    """)
+    # Recreated below as a covering index
+    cursor.execute("DROP INDEX IF EXISTS idx_tool_uses_name")
+
+
+def _migrate_to_v4(cursor: sqlite3.Cursor) -> None:
+    """Rebuild tables with ON DELETE CASCADE foreign keys."""
+    # otel_metrics as of v4; v5 moves its per-metric columns out
+    otel_metrics_sql = """
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            metric_name TEXT NOT NULL,
+            metric_value REAL NOT NULL,
+            metric_type TEXT DEFAULT 'counter',
+            unit TEXT,
+            description TEXT,
+            attributes TEXT,
+            timestamp INTEGER,
+            collected_at TEXT NOT NULL
+        )
+    """
+    rebuilt = (
+        ("turns", _TURNS_TABLE_SQL),
+        ("messages", _MESSAGES_TABLE_SQL),
+        ("tool_uses", _TOOL_USES_TABLE_SQL),
+        ("otel_metrics", otel_metrics_sql),
+        ("otel_session_summary", _OTEL_SUMMARY_TABLE_SQL),
+    )
+    for table, create_sql in rebuilt:
+        if not _table_exists(cursor, table):
+            continue
+        cursor.execute(f"SELECT * FROM {table} LIMIT 0")
+        columns = ", ".join(d[0] for d in cursor.description)
+        _rebuild_table(cursor, table, create_sql, columns, columns)
+
+
+def _migrate_to_v5(cursor: sqlite3.Cursor) -> None:
+    """Move per-metric type/unit/description into otel_metric_defs."""
+    cursor.execute(_OTEL_METRIC_DEFS_TABLE_SQL)
+    if not _table_exists(cursor, "otel_metrics"):
+        return
+    # Keep the fields of the most recent data point of each metric
+    cursor.execute("""
+        INSERT INTO otel_metric_defs (metric_name, metric_type, unit, description)
+        SELECT metric_name, metric_type, unit, description
+        FROM otel_metrics
+        WHERE id IN (SELECT MAX(id) FROM otel_metrics GROUP BY metric_name)
+    """)
+    _rebuild_table(
+        cursor,
+        "otel_metrics",
+        _OTEL_METRICS_TABLE_SQL,
+        "id, session_id, metric_def_id, metric_value, attributes, timestamp, "
+        "collected_at",
+        "id, session_id, "
+        "(SELECT metric_def_id FROM otel_metric_defs d "
+        "WHERE d.metric_name = otel_metrics.metric_name), "
+        "metric_value, attributes, timestamp, collected_at"
+    )
+
+
+def _migrate_to_v6(cursor: sqlite3.Cursor) -> None:
+    """Add denormalized turn/tool counters to sessions."""
+    cursor.execute("ALTER TABLE sessions ADD COLUMN turn_count INTEGER DEFAULT 0")
+    cursor.execute("ALTER TABLE sessions ADD COLUMN tool_count INTEGER DEFAULT 0")
+    if _table_exists(cursor, "turns") and _table_exists(cursor, "tool_uses"):
+        cursor.execute("""
+            UPDATE sessions SET
+                turn_count = (
+                    SELECT COUNT(*) FROM turns t
+                    WHERE t.session_id = sessions.session_id
+                ),
+                tool_count = (
+                    SELECT COUNT(*) FROM tool_uses tu
+                    WHERE tu.session_id = sessions.session_id
+                )
+        """)
+
+
+def _migrate_to_v7(cursor: sqlite3.Cursor) -> None:
+    """Drop indexes that are replaced by covering indexes."""
+    cursor.execute("DROP INDEX IF EXISTS idx_messages_turn")
+    cursor.execute("DROP INDEX IF EXISTS idx_turns_session")
+
+
+def _migrate_to_v8(cursor: sqlite3.Cursor) -> None:
+    """Drop idx_turns_session so it is recreated ordered by turn_number."""
+    cursor.execute("DROP INDEX IF EXISTS idx_turns_session")
+
+
+def _migrate_to_v9(cursor: sqlite3.Cursor) -> None:
+    """Add denormalized message and token totals to sessions."""
+    for column in (
+        "message_count", "total_input_tokens", "total_output_tokens",
+        "total_cache_read_tokens", "total_cache_creation_tokens",
+    ):
+        cursor.execute(
+            f"ALTER TABLE sessions ADD COLUMN {column} INTEGER DEFAULT 0"
+        )
+    if not (_table_exists(cursor, "turns") and _table_exists(cursor, "messages")):
+        return
+    cursor.execute("""
+        UPDATE sessions SET
+            (message_count, total_input_tokens, total_output_tokens,
+             total_cache_read_tokens, total_cache_creation_tokens) = (
+                SELECT COUNT(*), COALESCE(SUM(m.input_tokens), 0),
+                       COALESCE(SUM(m.output_tokens), 0),
+                       COALESCE(SUM(m.cache_read_tokens), 0),
+                       COALESCE(SUM(m.cache_creation_tokens), 0)
+                FROM turns t
+                JOIN messages m ON m.turn_id = t.turn_id
+                WHERE t.session_id = sessions.session_id
+            )
+    """)
+
+
+def _migrate_to_v10(cursor: sqlite3.Cursor) -> None:
+    """Drop idx_otel_metrics_session so it is recreated as a composite index."""
+    cursor.execute("DROP INDEX IF EXISTS idx_otel_metrics_session")
+
+
+def _migrate_to_v11(cursor: sqlite3.Cursor) -> None:
+    """Add otel_global_totals, filled from the existing session summaries."""
+    cursor.execute("DROP INDEX IF EXISTS idx_otel_summary_totals")
+    cursor.execute(_OTEL_TOTALS_TABLE_SQL)
+    if not _table_exists(cursor, "otel_session_summary"):
+        return
+    sums = ", ".join(f"COALESCE(SUM({c}), 0)" for c in _OTEL_TOTAL_COLUMNS)
+    cursor.execute(f"""
+        INSERT INTO otel_global_totals
+            (id, {', '.join(_OTEL_TOTAL_COLUMNS)}, api_latency_count,
+             session_count)
+        SELECT 1, {sums}, COUNT(api_latency_ms), COUNT(*)
+        FROM otel_session_summary
+    """)
+
+
+def _migrate_to_v12(cursor: sqlite3.Cursor) -> None:
+    """Add otel_metrics.timestamp_text, the data point timestamp as saved."""
+    if not _table_exists(cursor, "otel_metrics"):
+        return
+    # Tables rebuilt by the v5 migration already have the column
+    cursor.execute("PRAGMA table_info(otel_metrics)")
+    if "timestamp_text" not in (row[1] for row in cursor.fetchall()):
+        cursor.execute("ALTER TABLE otel_metrics ADD COLUMN timestamp_text TEXT")
+
+
+# Migration steps keyed by the schema version they upgrade to
+_MIGRATIONS = {
+    1: _migrate_to_v1,
+    2: _migrate_to_v2,
+    3: _migrate_to_v3,
+    4: _migrate_to_v4,
+    5: _migrate_to_v5,
+    6: _migrate_to_v6,
+    7: _migrate_to_v7,
+    8: _migrate_to_v8,
+    9: _migrate_to_v9,
+    10: _migrate_to_v10,
+    11: _migrate_to_v11,
+    12: _migrate_to_v12,
+}
+
+
+def _insert_sql(
+    table: str,
+    columns: Tuple[str, ...],
+    conflict_key: Optional[str] = None
+) -> str:
+    """
+    Build an INSERT statement, optionally as an UPSERT on a key column.
+    
+    Unlike INSERT OR REPLACE, an UPSERT updates the existing row in place
+    instead of deleting and re-inserting it.
+    
+    Args:
+        table: Table to insert into
+        columns: Columns bound, in parameter order
+        conflict_key: Primary key column to update on conflict
+    """
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' for _ in columns)})"
+    )
+    if conflict_key:
+        updates = ", ".join(
+            f"{column} = excluded.{column}"
+            for column in columns if column != conflict_key
+        )
+        sql += f" ON CONFLICT({conflict_key}) DO UPDATE SET {updates}"
+    return sql
+
+
+_SESSION_COLUMNS = (
+    "session_id", "start_time", "end_time", "total_duration_ms", "metadata",
+)
+_TURN_COLUMNS = (
+    "turn_id", "session_id", "turn_number", "start_time", "end_time",
+    "duration_ms",
+)
+_MESSAGE_COLUMNS = (
+    "message_id", "turn_id", "role", "content", "model_id", "timestamp",
+    "input_tokens", "output_tokens", "cache_read_tokens",
+    "cache_creation_tokens", "raw_data",
+)
+_TOOL_USE_COLUMNS = (
+    "tool_id", "session_id", "turn_id", "message_id", "tool_name_id",
+    "input_data", "output_data", "start_time", "end_time", "duration_ms",
+    "success", "error",
+)
+_OTEL_SUMMARY_COLUMNS = (
+    "session_id", "input_tokens", "output_tokens", "cache_read_tokens",
+    "cache_creation_tokens", "api_calls", "api_latency_ms", "tool_calls",
+    "errors", "collected_at",
+)
+_OTEL_METRIC_COLUMNS = (
+    "session_id", "metric_def_id", "metric_value", "attributes", "timestamp",
+    "timestamp_text", "collected_at",
+)
+
+# Plain INSERTs for first saves, UPSERTs for re-saves
+_INSERT_SESSION_SQL = _insert_sql("sessions", _SESSION_COLUMNS)
+_UPSERT_SESSION_SQL = _insert_sql("sessions", _SESSION_COLUMNS, "session_id")
+_INSERT_TURN_SQL = _insert_sql("turns", _TURN_COLUMNS)
+_UPSERT_TURN_SQL = _insert_sql("turns", _TURN_COLUMNS, "turn_id")
+_INSERT_MESSAGE_SQL = _insert_sql("messages", _MESSAGE_COLUMNS)
+_UPSERT_MESSAGE_SQL = _insert_sql("messages", _MESSAGE_COLUMNS, "message_id")
+_INSERT_TOOL_USE_SQL = _insert_sql("tool_uses", _TOOL_USE_COLUMNS)
+_UPSERT_TOOL_USE_SQL = _insert_sql("tool_uses", _TOOL_USE_COLUMNS, "tool_id")
+_UPSERT_OTEL_SUMMARY_SQL = _insert_sql(
+    "otel_session_summary", _OTEL_SUMMARY_COLUMNS, "session_id"
+)
+_INSERT_OTEL_METRIC_SQL = _insert_sql("otel_metrics", _OTEL_METRIC_COLUMNS)
+_UPSERT_OTEL_METRIC_DEF_SQL = _insert_sql(
+    "otel_metric_defs",
+    ("metric_name", "metric_type", "unit", "description"),
+    "metric_name"
+)
+
+# Refreshes the denormalized counters and token totals read by list_sessions
+# and get_aggregate_token_usage. They are counted from the stored rows, which
+# may include turns from earlier saves, using the covering idx_turns_session,
+# idx_tool_uses_session and idx_messages_tokens.
+_REFRESH_SESSION_TOTALS_SQL = """
+    UPDATE sessions SET
+        turn_count = (
+            SELECT COUNT(*) FROM turns WHERE session_id = :session_id
+        ),
+        tool_count = (
+            SELECT COUNT(*) FROM tool_uses WHERE session_id = :session_id
+        ),
+        (message_count, total_input_tokens, total_output_tokens,
+         total_cache_read_tokens, total_cache_creation_tokens) = (
+            SELECT COUNT(*), COALESCE(SUM(m.input_tokens), 0),
+                   COALESCE(SUM(m.output_tokens), 0),
+                   COALESCE(SUM(m.cache_read_tokens), 0),
+                   COALESCE(SUM(m.cache_creation_tokens), 0)
+            FROM turns t
+            JOIN messages m ON m.turn_id = t.turn_id
+            WHERE t.session_id = :session_id
+        )
+    WHERE session_id = :session_id
+"""
+_SELECT_METRIC_DEF_ID_SQL = (
+    "SELECT metric_def_id FROM otel_metric_defs WHERE metric_name = ?"
+)
+_SELECT_OTEL_SUMMARY_SQL = (
+    f"SELECT {', '.join(_OTEL_SUMMARY_COLUMNS)} "
+    "FROM otel_session_summary WHERE session_id = ?"
+)
+
+
+# Compact per-type encodings of ContentBlock for messages.content: only the
+# fields a block type uses are written, under short keys, with "t" tagging
+# the type
+_BLOCK_SERIALIZERS: Dict[ContentType, Callable[[ContentBlock], Dict[str, Any]]] = {
+    ContentType.TEXT: lambda b: {"t": "x", "x": b.text},
+    ContentType.THINKING: lambda b: {"t": "th", "x": b.thinking},
+    ContentType.TOOL_USE: lambda b: {
+        "t": "tu", "id": b.tool_use_id, "n": b.tool_name, "i": b.tool_input
+    },
+    ContentType.TOOL_RESULT: lambda b: {
+        "t": "tr", "id": b.tool_use_id, "r": b.tool_result
+    },
+}
+
+_BLOCK_DESERIALIZERS: Dict[str, Callable[[Dict[str, Any]], ContentBlock]] = {
+    "x": lambda d: ContentBlock(type=ContentType.TEXT, text=d.get("x")),
+    "th": lambda d: ContentBlock(type=ContentType.THINKING, thinking=d.get("x")),
+    "tu": lambda d: ContentBlock(
+        type=ContentType.TOOL_USE,
+        tool_use_id=d.get("id"),
+        tool_name=d.get("n"),
+        tool_input=d.get("i")
+    ),
+    "tr": lambda d: ContentBlock(
+        type=ContentType.TOOL_RESULT,
+        tool_use_id=d.get("id"),
+        tool_result=d.get("r")
+    ),
+}
+
+
+def _serialize_content(blocks: List[ContentBlock]) -> str:
+    """Encode content blocks for the messages.content column."""
+    return json_dumps([_BLOCK_SERIALIZERS[block.type](block) for block in blocks])
+
+
+def _deserialize_block(data: Dict[str, Any]) -> ContentBlock:
+    """Decode one stored content block."""
+    decode = _BLOCK_DESERIALIZERS.get(data.get("t"))
+    if decode:
+        return decode(data)
+    # Rows written before the compact encoding stored every field by name
+    return ContentBlock(
+        type=ContentType(data.get("type", "text")),
+        text=data.get("text"),
+        thinking=data.get("thinking"),
+        tool_use_id=data.get("tool_use_id"),
+        tool_name=data.get("tool_name"),
+        tool_input=data.get("tool_input"),
+        tool_result=data.get("tool_result")
+    )
+
+
+def _decode_content(stored: Union[str, bytes, None]) -> List[ContentBlock]:
+    """Decode a messages.content value into content blocks."""
+    content_json = _decompress_text(stored)
+    if not content_json:
+        return []
+    return [_deserialize_block(c) for c in json_loads(content_json)]
+
+
+# Marks a _StoredMessage attribute that has not been decoded yet
+_PENDING = object()
+
+
+class _StoredMessage(Message):
+    """
+    Message loaded by get_session whose content and raw_data are decoded
+    from their stored column values on first access.
+    
+    Readers that only need roles, timestamps or token counts never pay for
+    decompressing and parsing payloads. A message saved again before either
+    attribute was accessed writes the stored values back unchanged.
+    """
+    
+    __slots__ = ("_content", "_raw_data", "_stored_content", "_stored_raw_data")
+    
+    @property
+    def content(self) -> List[ContentBlock]:
+        """Content blocks, decoded on first access."""
+        if self._content is _PENDING:
+            self._content = _decode_content(self._stored_content)
+            self._stored_content = None
+        return self._content
+    
+    @content.setter
+    def content(self, value: List[ContentBlock]) -> None:
+        self._content = value
+    
+    @property
+    def raw_data(self) -> Optional[Dict[str, Any]]:
+        """Raw transcript entry, decoded on first access."""
+        if self._raw_data is _PENDING:
+            self._raw_data = json_loads(_decompress_text(self._stored_raw_data))
+            self._stored_raw_data = None
+        return self._raw_data
+    
+    @raw_data.setter
+    def raw_data(self, value: Optional[Dict[str, Any]]) -> None:
+        self._raw_data = value
+    
+    def __eq__(self, other: object) -> bool:
+        # The generated Message.__eq__ only compares instances of one class
+        if not isinstance(other, Message):
+            return NotImplemented
+        return all(
+            getattr(self, f.name) == getattr(other, f.name)
+            for f in fields(Message)
+        )
+    
+    __hash__ = None
+    
+    def __reduce__(self):
+        # Copies and pickles are plain, fully decoded Messages
+        return (Message, tuple(getattr(self, f.name) for f in fields(Message)))
+
+
+# How long the background writer keeps collecting queued writes into the
+# transaction it is about to commit
+_WRITE_BATCH_WINDOW = 0.2
+
+# Writes the background queue holds before save calls block, bounding memory
+# when the writer falls behind
+_WRITE_QUEUE_SIZE = 10000
+
+# Seconds a connection waits for another writer's lock before failing
+_BUSY_TIMEOUT = 5.0
+
+# Page cache per connection; negative values are KiB rather than pages
+_CACHE_SIZE_KIB = -64000
+
+# Bytes of the database file each connection may read through a memory map
+# instead of read() calls; SQLite maps no more than the file's size
+_MMAP_SIZE = 1024 ** 3
+
+# Idle read-only connections kept open by each TraceStorage
+_READ_POOL_SIZE = 4
+
+# Rows sampled per index when PRAGMA optimize runs ANALYZE, bounding its cost
+# on large databases
+_ANALYSIS_LIMIT = 400
+
+# Saves of at least this many turns refresh planner statistics right away
+# rather than waiting for close()
+_OPTIMIZE_MIN_TURNS = 100
+
+# Rows per Parquet row group written by export_parquet()
+_PARQUET_ROW_GROUP_SIZE = 64 * 1024
+
+# Rows fetched from SQLite per batch by iter_otel_metrics()
+_OTEL_METRICS_FETCH_SIZE = 1000
+
+
+class _Percentile:
+    """
+    SQLite aggregate percentile(value, fraction) with linear interpolation.
+    
+    NULL values are ignored; returns NULL when no values were aggregated.
+    """
+    
+    def __init__(self):
+        """Start an empty aggregate."""
+        self.values: List[float] = []
+        self.fraction = 0.0
+    
+    def step(self, value: Optional[float], fraction: float) -> None:
+        """Add one row's value."""
+        if value is not None:
+            self.values.append(value)
+        self.fraction = fraction
+    
+    def finalize(self) -> Optional[float]:
+        """Return the interpolated percentile of the collected values."""
+        if not self.values:
+            return None
+        values = sorted(self.values)
+        position = (len(values) - 1) * self.fraction
+        lower = int(position)
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (position - lower)
 
 
 class TraceStorage:
@@ -30,16 +889,63 @@ class TraceStorage:
     
     DEFAULT_DB_PATH = os.path.expanduser("~/.claude-trace/traces.db")
     
-    def __init__(self, db_path: Optional[str] = None):
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        background_writes: bool = False,
+        ephemeral: bool = False
+    ):
         """
         Initialize the storage.
         
         Args:
             db_path: Path to SQLite database file. Uses default if not specified.
+            background_writes: Queue save_session/save_otel_metrics calls to a
+                writer thread that commits everything queued within
+                _WRITE_BATCH_WINDOW seconds as one transaction. Writes are
+                visible to readers after flush(); objects passed to the save
+                methods must not be modified before then. Once
+                _WRITE_QUEUE_SIZE writes are pending, save calls wait for
+                the writer to catch up.
+            ephemeral: Skip durability for a throwaway database, such as
+                one in a test's temporary directory: fsyncs are turned off
+                and the rollback journal is kept in memory instead of WAL.
+                A crash can corrupt the database, and readers and the
+                writer briefly block each other.
         """
         self.db_path = db_path or self.DEFAULT_DB_PATH
+        self.ephemeral = ephemeral
+        # name -> id caches for the models/tool_names lookup tables
+        self._model_ids: Dict[str, int] = {}
+        self._tool_name_ids: Dict[str, int] = {}
         self._ensure_directory()
         self._init_db()
+        
+        # Connection shared by all writes, opened on first use; the lock
+        # serializes threads using it. Reads use idle read-only
+        # connections from _readers, which in WAL mode never wait for it.
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._readers: List[sqlite3.Connection] = []
+        # Thread inside bulk_context(), which holds _lock and the open
+        # transaction on _conn until its outermost block exits
+        self._bulk_thread: Optional[int] = None
+        
+        self._write_queue: Optional[queue.Queue] = None
+        self._writer: Optional[threading.Thread] = None
+        self._writer_error: Optional[Exception] = None
+        if background_writes:
+            self._write_queue = queue.Queue(maxsize=_WRITE_QUEUE_SIZE)
+            self._writer = threading.Thread(
+                target=self._writer_loop,
+                name="trace-storage-writer",
+                daemon=True
+            )
+            self._writer.start()
+            # Only a writer thread needs flushing at exit; registering every
+            # instance would keep unclosed ones, and their connections,
+            # alive until the process ends
+            atexit.register(self.close)
     
     def _ensure_directory(self):
         """Ensure the database directory exists."""
@@ -47,267 +953,605 @@ class TraceStorage:
         if db_dir:
             os.makedirs(db_dir, exist_ok=True)
     
-    def _get_connection(self) -> sqlite3.Connection:
-        """Get a database connection."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+    def _get_connection(self, read_only: bool = False) -> sqlite3.Connection:
+        """
+        Get a database connection.
+        
+        Args:
+            read_only: Open the database with mode=ro, so the connection
+                can never write or take the write lock.
+        
+        Connections are in autocommit mode; writers open their transaction
+        with an explicit BEGIN IMMEDIATE and end it with commit(). Taking
+        the write lock up front means a transaction that starts by reading
+        waits for other writers instead of failing with SQLITE_BUSY when it
+        first writes. Closing a connection rolls back a transaction that
+        was not committed.
+        
+        In WAL mode synchronous=NORMAL fsyncs only at checkpoints; a power
+        loss can drop the last commits but never corrupts the database.
+        """
+        if read_only:
+            database = Path(self.db_path).absolute().as_uri() + "?mode=ro"
+        else:
+            database = self.db_path
+        conn = sqlite3.connect(
+            database,
+            timeout=_BUSY_TIMEOUT,
+            check_same_thread=False,
+            uri=read_only,
+            cached_statements=256,
+            isolation_level=None
+        )
+        if self.ephemeral:
+            conn.execute("PRAGMA synchronous = OFF")
+            if not read_only:
+                conn.execute("PRAGMA journal_mode = MEMORY")
+        else:
+            conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute(f"PRAGMA cache_size = {_CACHE_SIZE_KIB}")
+        conn.execute(f"PRAGMA analysis_limit = {_ANALYSIS_LIMIT}")
+        conn.execute(f"PRAGMA mmap_size = {_MMAP_SIZE}")
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.create_aggregate("percentile", 2, _Percentile)
         return conn
     
+    @contextmanager
+    def _write_connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Hold the shared write connection for one operation.
+        
+        Reusing the connection keeps its page cache and prepared statements
+        warm between calls. A transaction the operation left open because
+        it failed is rolled back before the connection is released.
+        Inside bulk_context() the thread already holds the connection and
+        its transaction, and gets them as they are.
+        """
+        if self._bulk_thread == threading.get_ident():
+            yield self._conn
+            return
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._get_connection()
+            try:
+                yield self._conn
+            finally:
+                if self._conn.in_transaction:
+                    self._conn.rollback()
+    
+    @contextmanager
+    def _write_transaction(self) -> Iterator[sqlite3.Cursor]:
+        """
+        Run a block as one BEGIN IMMEDIATE transaction on the write
+        connection, committing when it completes.
+        
+        If the block raises, the transaction is rolled back and lookup ids
+        it may have inserted are dropped from the caches. Inside
+        bulk_context() the block runs as a savepoint of the bulk transaction
+        instead.
+        """
+        if self._bulk_thread == threading.get_ident():
+            with self._savepoint() as cursor:
+                yield cursor
+            return
+        with self._write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                self._model_ids.clear()
+                self._tool_name_ids.clear()
+                raise
+    
+    @contextmanager
+    def _savepoint(self) -> Iterator[sqlite3.Cursor]:
+        """
+        Run a block as a savepoint of the bulk_context() transaction.
+        
+        If the block raises, only its own writes are rolled back.
+        """
+        cursor = self._conn.cursor()
+        cursor.execute("SAVEPOINT bulk_write")
+        try:
+            yield cursor
+        except BaseException:
+            cursor.execute("ROLLBACK TO bulk_write")
+            cursor.execute("RELEASE bulk_write")
+            self._model_ids.clear()
+            self._tool_name_ids.clear()
+            raise
+        cursor.execute("RELEASE bulk_write")
+    
+    @contextmanager
+    def bulk_context(self) -> Iterator[None]:
+        """
+        Group the writes made in a block into one transaction.
+        
+        save_session(), save_sessions(), save_otel_metrics() and
+        delete_session() calls made by this thread inside the block share
+        one BEGIN IMMEDIATE transaction, committed when the outermost block
+        completes, so a batch of saves costs one commit instead of one each.
+        Each save runs as a savepoint: one that fails is rolled back before
+        it raises, so a caller that catches the error keeps the earlier
+        saves. If the block raises, every write in it is rolled back.
+        Nested blocks are savepoints as well.
+        
+        Reads inside the block use their own connections and do not see
+        its writes until it commits. Other threads' writes wait for the
+        block to finish. With background_writes the block opens no
+        transaction: saves are queued as usual and already batched by the
+        writer thread, which must not wait on a transaction held here.
+        
+        Example:
+            with storage.bulk_context():
+                for session in sessions:
+                    storage.save_session(session)
+        """
+        if self._writer is not None:
+            yield
+            return
+        if self._bulk_thread == threading.get_ident():
+            with self._savepoint():
+                yield
+            return
+        with self._write_transaction():
+            self._bulk_thread = threading.get_ident()
+            try:
+                yield
+            finally:
+                self._bulk_thread = None
+    
+    @contextmanager
+    def _read_connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow a read-only connection for one operation.
+        
+        An idle pooled connection is reused when there is one; otherwise a
+        new one is opened. At most _READ_POOL_SIZE idle connections are kept.
+        """
+        # list.pop() and append() are atomic, so threads need no lock here
+        try:
+            conn = self._readers.pop()
+        except IndexError:
+            conn = self._get_connection(read_only=True)
+        try:
+            yield conn
+        finally:
+            if len(self._readers) < _READ_POOL_SIZE:
+                self._readers.append(conn)
+            else:
+                conn.close()
+    
     def _init_db(self):
         """Initialize database schema."""
         conn = self._get_connection()
         try:
             cursor = conn.cursor()
             
+            # WAL lets readers run alongside a writer and makes commits a
+            # sequential append. The mode is stored in the database file and
+            # cannot be changed inside a transaction. Ephemeral databases
+            # keep the in-memory journal set by _get_connection().
+            if not self.ephemeral:
+                cursor.execute("PRAGMA journal_mode = WAL")
+            
+            # Rebuilding a table drops the old copy, which must not cascade.
+            # The pragma is a no-op inside a transaction, so it goes first.
+            cursor.execute("PRAGMA foreign_keys = OFF")
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            # Upgrade databases created by older versions before touching
+            # the schema; brand-new databases are created at SCHEMA_VERSION.
+            cursor.execute("PRAGMA user_version")
+            version = cursor.fetchone()[0]
+            if _table_exists(cursor, "sessions"):
+                for target in range(version + 1, SCHEMA_VERSION + 1):
+                    _MIGRATIONS[target](cursor)
+            
             # Sessions table
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS sessions (
                     session_id TEXT PRIMARY KEY,
-                    start_time TEXT NOT NULL,
-                    end_time TEXT,
+                    start_time INTEGER,
+                    end_time INTEGER,
                     total_duration_ms INTEGER,
-                    metadata TEXT
+                    metadata TEXT,
+                    turn_count INTEGER DEFAULT 0,
+                    tool_count INTEGER DEFAULT 0,
+                    message_count INTEGER DEFAULT 0,
+                    total_input_tokens INTEGER DEFAULT 0,
+                    total_output_tokens INTEGER DEFAULT 0,
+                    total_cache_read_tokens INTEGER DEFAULT 0,
+                    total_cache_creation_tokens INTEGER DEFAULT 0
                 )
             """)
             
             # Turns table
+            cursor.execute(_TURNS_TABLE_SQL.format(table="turns"))
+            
+            # Lookup tables for low-cardinality names repeated on every row
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS turns (
-                    turn_id TEXT PRIMARY KEY,
-                    session_id TEXT NOT NULL,
-                    turn_number INTEGER NOT NULL,
-                    start_time TEXT NOT NULL,
-                    end_time TEXT,
-                    duration_ms INTEGER,
-                    FOREIGN KEY (session_id) REFERENCES sessions(session_id)
+                CREATE TABLE IF NOT EXISTS models (
+                    model_id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL UNIQUE
                 )
             """)
-            
-            # Messages table
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS messages (
-                    message_id TEXT PRIMARY KEY,
-                    turn_id TEXT NOT NULL,
-                    role TEXT NOT NULL,
-                    content TEXT,
-                    model TEXT,
-                    timestamp TEXT NOT NULL,
-                    input_tokens INTEGER,
-                    output_tokens INTEGER,
-                    cache_read_tokens INTEGER,
-                    cache_creation_tokens INTEGER,
-                    raw_data TEXT,
-                    FOREIGN KEY (turn_id) REFERENCES turns(turn_id)
+                CREATE TABLE IF NOT EXISTS tool_names (
+                    tool_name_id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL UNIQUE
                 )
             """)
             
+            # Messages table
+            cursor.execute(_MESSAGES_TABLE_SQL.format(table="messages"))
+            
             # Tool uses table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS tool_uses (
-                    tool_id TEXT PRIMARY KEY,
-                    turn_id TEXT NOT NULL,
-                    message_id TEXT,
-                    tool_name TEXT NOT NULL,
-                    input_data TEXT,
-                    output_data TEXT,
-                    start_time TEXT NOT NULL,
-                    end_time TEXT,
-                    duration_ms INTEGER,
-                    success INTEGER DEFAULT 1,
-                    error TEXT,
-                    FOREIGN KEY (turn_id) REFERENCES turns(turn_id),
-                    FOREIGN KEY (message_id) REFERENCES messages(message_id)
-                )
-            """)
+            cursor.execute(_TOOL_USES_TABLE_SQL.format(table="tool_uses"))
             
-            # OTEL metrics table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS otel_metrics (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    session_id TEXT NOT NULL,
-                    metric_name TEXT NOT NULL,
-                    metric_value REAL NOT NULL,
-                    metric_type TEXT DEFAULT 'counter',
-                    unit TEXT,
-                    description TEXT,
-                    attributes TEXT,
-                    timestamp TEXT,
-                    collected_at TEXT NOT NULL,
-                    FOREIGN KEY (session_id) REFERENCES sessions(session_id)
-                )
-            """)
+            # OTEL metrics tables
+            cursor.execute(_OTEL_METRIC_DEFS_TABLE_SQL)
+            cursor.execute(_OTEL_METRICS_TABLE_SQL.format(table="otel_metrics"))
             
             # OTEL session summary table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS otel_session_summary (
-                    session_id TEXT PRIMARY KEY,
-                    input_tokens INTEGER DEFAULT 0,
-                    output_tokens INTEGER DEFAULT 0,
-                    cache_read_tokens INTEGER DEFAULT 0,
-                    cache_creation_tokens INTEGER DEFAULT 0,
-                    api_calls INTEGER DEFAULT 0,
-                    api_latency_ms REAL DEFAULT 0,
-                    tool_calls INTEGER DEFAULT 0,
-                    errors INTEGER DEFAULT 0,
-                    raw_output TEXT,
-                    collected_at TEXT,
-                    FOREIGN KEY (session_id) REFERENCES sessions(session_id)
-                )
-            """)
+            cursor.execute(_OTEL_SUMMARY_TABLE_SQL.format(table="otel_session_summary"))
+            cursor.execute(_OTEL_TOTALS_TABLE_SQL)
+            cursor.execute(
+                "INSERT OR IGNORE INTO otel_global_totals (id) VALUES (1)"
+            )
+            for trigger_sql in _OTEL_TOTALS_TRIGGERS_SQL:
+                cursor.execute(trigger_sql)
             
             # Create indexes
+            # Returns a session's turns already in turn_number order, and
+            # includes turn_id so joins from a session to its messages
+            # never read the turns table itself
             cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_turns_session 
-                ON turns(session_id)
+                ON turns(session_id, turn_number, turn_id)
             """)
+            # Covers the per-session token SUMs refreshed by save_session,
+            # so they never read pages holding message content; also serves
+            # lookups by turn_id.
             cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_messages_turn 
-                ON messages(turn_id)
+                CREATE INDEX IF NOT EXISTS idx_messages_tokens 
+                ON messages(turn_id, input_tokens, output_tokens,
+                            cache_read_tokens, cache_creation_tokens)
             """)
             cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_tool_uses_turn 
                 ON tool_uses(turn_id)
             """)
+            # Covering indexes for get_tool_stats and the list_sessions
+            # counts: the GROUP BY walks index order with no table lookups.
             cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_tool_uses_name 
-                ON tool_uses(tool_name)
+                ON tool_uses(tool_name_id, success, duration_ms)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_tool_uses_session 
+                ON tool_uses(session_id, tool_name_id, success, duration_ms)
             """)
             cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_sessions_start_time 
                 ON sessions(start_time)
             """)
+            # get_otel_metrics walks metric definitions in name order and
+            # reads each one's data points already sorted by timestamp
             cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_otel_metrics_session 
-                ON otel_metrics(session_id)
+                ON otel_metrics(session_id, metric_def_id, timestamp)
             """)
             cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_otel_metrics_name 
-                ON otel_metrics(metric_name)
+                ON otel_metrics(metric_def_id)
             """)
             
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
             conn.commit()
+            
+            # Gather planner statistics for tables that lack them
+            cursor.execute("PRAGMA optimize")
         finally:
             conn.close()
     
-    def save_session(self, session: Session) -> None:
+    def flush(self) -> None:
         """
-        Save or update a session in the database.
+        Wait until queued background writes are committed.
         
-        Args:
-            session: Session to save
+        Raises:
+            Exception: The first error raised by a queued write since the
+                last flush; the other queued writes are still committed.
+        """
+        if self._write_queue is None:
+            return
+        self._write_queue.join()
+        error, self._writer_error = self._writer_error, None
+        if error:
+            raise error
+    
+    def close(self) -> None:
+        """
+        Flush queued background writes, stop the writer thread and close
+        all connections.
+        
+        The storage stays usable; the next call reopens what it needs.
         """
+        atexit.unregister(self.close)
+        try:
+            if self._writer is not None:
+                self._write_queue.put(None)
+                self._writer.join()
+                self._writer = None
+                self.flush()
+                self._write_queue = None
+        finally:
+            with self._lock:
+                if self._conn is not None:
+                    try:
+                        # Re-analyze tables whose size changed a lot since
+                        # statistics were gathered, as SQLite recommends
+                        # before closing
+                        self._conn.execute("PRAGMA optimize")
+                    finally:
+                        self._conn.close()
+                        self._conn = None
+            while self._readers:
+                self._readers.pop().close()
+    
+    def _writer_loop(self) -> None:
+        """Commit queued writes in batches until close() queues None."""
         conn = self._get_connection()
         try:
-            cursor = conn.cursor()
-            
-            # Insert or replace session
-            cursor.execute("""
-                INSERT OR REPLACE INTO sessions 
-                (session_id, start_time, end_time, total_duration_ms, metadata)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                session.session_id,
-                session.start_time.isoformat() if session.start_time else "",
-                session.end_time.isoformat() if session.end_time else None,
-                session.duration_ms,
-                json.dumps(session.metadata) if session.metadata else None
-            ))
-            
-            # Save turns
-            for turn in session.turns:
-                self._save_turn(cursor, session.session_id, turn)
-            
-            conn.commit()
+            stopping = False
+            while not stopping:
+                batch = [self._write_queue.get()]
+                if batch[0] is None:
+                    self._write_queue.task_done()
+                    break
+                
+                deadline = time.monotonic() + _WRITE_BATCH_WINDOW
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._write_queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        self._write_queue.task_done()
+                        break
+                    batch.append(item)
+                
+                self._write_batch(conn, batch)
+                for _ in batch:
+                    self._write_queue.task_done()
         finally:
-            conn.close()
+            try:
+                conn.execute("PRAGMA optimize")
+            finally:
+                conn.close()
     
-    def _save_turn(self, cursor: sqlite3.Cursor, session_id: str, turn: Turn) -> None:
-        """Save a turn and its messages/tools."""
-        # Insert or replace turn
-        cursor.execute("""
-            INSERT OR REPLACE INTO turns
-            (turn_id, session_id, turn_number, start_time, end_time, duration_ms)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
+    def _write_batch(self, conn: sqlite3.Connection, batch: List[tuple]) -> None:
+        """
+        Run queued writes in one transaction.
+        
+        Each write runs inside its own savepoint, so a failing write is
+        rolled back and recorded without discarding the rest of the batch.
+        """
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for write, args in batch:
+                cursor.execute("SAVEPOINT queued_write")
+                try:
+                    write(cursor, *args)
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO queued_write")
+                    self._model_ids.clear()
+                    self._tool_name_ids.clear()
+                    self._writer_error = self._writer_error or e
+                cursor.execute("RELEASE queued_write")
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            self._model_ids.clear()
+            self._tool_name_ids.clear()
+            self._writer_error = self._writer_error or e
+    
+    def save_session(self, session: Session, first_save: bool = False) -> None:
+        """
+        Save or update a session in the database.
+        
+        Args:
+            session: Session to save
+            first_save: True if none of the session's rows are stored yet.
+                Rows are then written with plain INSERTs, skipping the
+                conflict check; an existing row raises sqlite3.IntegrityError.
+        """
+        self.save_sessions([session], first_save=first_save)
+    
+    def save_sessions(
+        self,
+        sessions: List[Session],
+        first_save: bool = False
+    ) -> None:
+        """
+        Save or update several sessions in one transaction.
+        
+        Either every session is stored or, if one fails, none are.
+        
+        Args:
+            sessions: Sessions to save
+            first_save: As for save_session(), applied to every session
+        """
+        if self._write_queue is not None:
+            for session in sessions:
+                self._write_queue.put((self._write_session, (session, first_save)))
+            return
+        
+        with self._write_transaction() as cursor:
+            for session in sessions:
+                self._write_session(cursor, session, first_save)
+        if sum(len(s.turns) for s in sessions) >= _OPTIMIZE_MIN_TURNS:
+            with self._write_connection() as conn:
+                conn.execute("PRAGMA optimize")
+    
+    def _write_session(
+        self,
+        cursor: sqlite3.Cursor,
+        session: Session,
+        first_save: bool
+    ) -> None:
+        """Write a session's rows inside the caller's transaction."""
+        # Insert or update session
+        sql = _INSERT_SESSION_SQL if first_save else _UPSERT_SESSION_SQL
+        cursor.execute(sql, (
+            session.session_id,
+            to_epoch_us(session.start_time),
+            to_epoch_us(session.end_time),
+            session.duration_ms,
+            json_dumps(session.metadata) if session.metadata else None
+        ))
+        
+        # Build every child row first, then write each table with one
+        # executemany. Parents go before children for the foreign keys.
+        session_id = session.session_id
+        turn_rows = []
+        message_rows = []
+        tool_rows = []
+        for turn in session.turns:
+            turn_rows.append(self._turn_row(session_id, turn))
+            message_rows.append(
+                self._message_row(cursor, turn.turn_id, turn.user_message)
+            )
+            for msg in turn.assistant_messages:
+                message_rows.append(self._message_row(cursor, turn.turn_id, msg))
+            for tool in turn.tool_uses:
+                tool_rows.append(
+                    self._tool_use_row(cursor, session_id, turn.turn_id, tool)
+                )
+        
+        if first_save:
+            cursor.executemany(_INSERT_TURN_SQL, turn_rows)
+            cursor.executemany(_INSERT_MESSAGE_SQL, message_rows)
+            cursor.executemany(_INSERT_TOOL_USE_SQL, tool_rows)
+        else:
+            cursor.executemany(_UPSERT_TURN_SQL, turn_rows)
+            cursor.executemany(_UPSERT_MESSAGE_SQL, message_rows)
+            cursor.executemany(_UPSERT_TOOL_USE_SQL, tool_rows)
+        
+        # Refresh the denormalized counters and token totals
+        cursor.execute(_REFRESH_SESSION_TOTALS_SQL, {"session_id": session_id})
+    
+    def _lookup_id(
+        self,
+        cursor: sqlite3.Cursor,
+        table: str,
+        id_column: str,
+        cache: Dict[str, int],
+        name: str
+    ) -> int:
+        """Get the id of a name in a lookup table, inserting it if new."""
+        lookup_id = cache.get(name)
+        if lookup_id is None:
+            cursor.execute(
+                f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", (name,)
+            )
+            cursor.execute(
+                f"SELECT {id_column} FROM {table} WHERE name = ?", (name,)
+            )
+            lookup_id = cursor.fetchone()[0]
+            cache[name] = lookup_id
+        return lookup_id
+    
+    def _get_model_id(self, cursor: sqlite3.Cursor, model: Optional[str]) -> Optional[int]:
+        """Get the models.model_id for a model name."""
+        if not model:
+            return None
+        return self._lookup_id(cursor, "models", "model_id", self._model_ids, model)
+    
+    def _get_tool_name_id(self, cursor: sqlite3.Cursor, tool_name: str) -> int:
+        """Get the tool_names.tool_name_id for a tool name."""
+        return self._lookup_id(
+            cursor, "tool_names", "tool_name_id", self._tool_name_ids, tool_name
+        )
+    
+    def _turn_row(self, session_id: str, turn: Turn) -> tuple:
+        """Build a turns row in _TURN_COLUMNS order."""
+        return (
             turn.turn_id,
             session_id,
             turn.turn_number,
-            turn.start_time.isoformat() if turn.start_time else "",
-            turn.end_time.isoformat() if turn.end_time else None,
+            to_epoch_us(turn.start_time),
+            to_epoch_us(turn.end_time),
             turn.duration_ms
-        ))
-        
-        # Save user message
-        self._save_message(cursor, turn.turn_id, turn.user_message)
-        
-        # Save assistant messages
-        for msg in turn.assistant_messages:
-            self._save_message(cursor, turn.turn_id, msg)
-        
-        # Save tool uses
-        for tool in turn.tool_uses:
-            self._save_tool_use(cursor, turn.turn_id, tool)
-    
-    def _save_message(self, cursor: sqlite3.Cursor, turn_id: str, message: Message) -> None:
-        """Save a message."""
-        content_json = json.dumps([
-            {
-                "type": block.type.value,
-                "text": block.text,
-                "thinking": block.thinking,
-                "tool_use_id": block.tool_use_id,
-                "tool_name": block.tool_name,
-                "tool_input": block.tool_input,
-                "tool_result": block.tool_result
-            }
-            for block in message.content
-        ])
-        
-        cursor.execute("""
-            INSERT OR REPLACE INTO messages
-            (message_id, turn_id, role, content, model, timestamp,
-             input_tokens, output_tokens, cache_read_tokens, cache_creation_tokens, raw_data)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+        )
+    
+    def _message_row(
+        self,
+        cursor: sqlite3.Cursor,
+        turn_id: str,
+        message: Message
+    ) -> tuple:
+        """Build a messages row in _MESSAGE_COLUMNS order."""
+        # Payloads of a loaded message that were never accessed, and so
+        # cannot have changed, are written back without re-encoding
+        if isinstance(message, _StoredMessage) and message._content is _PENDING:
+            content = message._stored_content
+        else:
+            content = _compress_text(_serialize_content(message.content))
+        if isinstance(message, _StoredMessage) and message._raw_data is _PENDING:
+            raw_data = message._stored_raw_data
+        else:
+            raw_data = (
+                _compress_text(json_dumps(message.raw_data))
+                if message.raw_data else None
+            )
+        usage = message.usage
+        return (
             message.message_id,
             turn_id,
             message.role.value,
-            content_json,
-            message.model,
-            message.timestamp.isoformat(),
-            message.usage.input_tokens if message.usage else 0,
-            message.usage.output_tokens if message.usage else 0,
-            message.usage.cache_read_tokens if message.usage else 0,
-            message.usage.cache_creation_tokens if message.usage else 0,
-            json.dumps(message.raw_data) if message.raw_data else None
-        ))
+            content,
+            self._get_model_id(cursor, message.model),
+            to_epoch_us(message.timestamp),
+            usage.input_tokens if usage else 0,
+            usage.output_tokens if usage else 0,
+            usage.cache_read_tokens if usage else 0,
+            usage.cache_creation_tokens if usage else 0,
+            raw_data
+        )
     
-    def _save_tool_use(
+    def _tool_use_row(
         self, 
         cursor: sqlite3.Cursor, 
+        session_id: str,
         turn_id: str, 
         tool: ToolUse,
         message_id: Optional[str] = None
-    ) -> None:
-        """Save a tool use."""
-        cursor.execute("""
-            INSERT OR REPLACE INTO tool_uses
-            (tool_id, turn_id, message_id, tool_name, input_data, output_data,
-             start_time, end_time, duration_ms, success, error)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+    ) -> tuple:
+        """Build a tool_uses row in _TOOL_USE_COLUMNS order."""
+        return (
             tool.tool_id,
+            session_id,
             turn_id,
             message_id,
-            tool.tool_name,
-            json.dumps(tool.input_data) if tool.input_data else None,
-            tool.output_data,
-            tool.start_time.isoformat() if tool.start_time else "",
-            tool.end_time.isoformat() if tool.end_time else None,
+            self._get_tool_name_id(cursor, tool.tool_name),
+            _compress_text(json_dumps(tool.input_data)) if tool.input_data else None,
+            _compress_text(tool.output_data),
+            to_epoch_us(tool.start_time),
+            to_epoch_us(tool.end_time),
             tool.duration_ms,
             1 if tool.success else 0,
             tool.error
-        ))
+        )
     
     def get_session(self, session_id: str) -> Optional[Session]:
         """
@@ -319,113 +1563,148 @@ class TraceStorage:
         Returns:
             Session object or None if not found
         """
-        conn = self._get_connection()
-        try:
+        with self._read_connection() as conn:
             cursor = conn.cursor()
             
             # Get session
-            cursor.execute(
-                "SELECT * FROM sessions WHERE session_id = ?", 
-                (session_id,)
-            )
-            row = cursor.fetchone()
+            row = self._iter_rows(cursor, """
+                SELECT start_time, end_time, metadata
+                FROM sessions
+                WHERE session_id = ?
+            """, (session_id,)).fetchone()
             if not row:
                 return None
             
+            start_time, end_time, metadata = row
             session = Session(
-                session_id=row["session_id"],
-                start_time=parse_timestamp(row["start_time"]) if row["start_time"] else None,
-                end_time=parse_timestamp(row["end_time"]) if row["end_time"] else None,
-                metadata=json.loads(row["metadata"]) if row["metadata"] else {}
+                session_id=session_id,
+                start_time=from_epoch_us(start_time),
+                end_time=from_epoch_us(end_time),
+                metadata=json_loads(metadata) if metadata else {}
             )
             
             # Get turns
             session.turns = self._load_turns(cursor, session_id)
             
             return session
-        finally:
-            conn.close()
+    
+    def _iter_rows(
+        self,
+        cursor: sqlite3.Cursor,
+        sql: str,
+        params: tuple
+    ) -> sqlite3.Cursor:
+        """
+        Run a query on a fresh plain-tuple cursor of the same connection.
+        
+        The result is iterated lazily instead of with fetchall(), and a
+        separate cursor lets callers run nested queries while iterating.
+        """
+        return cursor.connection.execute(sql, params)
     
     def _load_turns(self, cursor: sqlite3.Cursor, session_id: str) -> List[Turn]:
         """Load turns for a session."""
-        cursor.execute(
-            "SELECT * FROM turns WHERE session_id = ? ORDER BY turn_number",
-            (session_id,)
-        )
+        rows = self._iter_rows(cursor, """
+            SELECT turn_id, turn_number, start_time, end_time
+            FROM turns
+            WHERE session_id = ?
+            ORDER BY turn_number
+        """, (session_id,))
         turns = []
-        for row in cursor.fetchall():
-            turn = Turn(
-                turn_id=row["turn_id"],
-                turn_number=row["turn_number"],
+        for turn_id, turn_number, start_time, end_time in rows:
+            turns.append(Turn(
+                turn_id=turn_id,
+                turn_number=turn_number,
                 user_message=None,  # Will be set below
-                start_time=parse_timestamp(row["start_time"]) if row["start_time"] else None,
-                end_time=parse_timestamp(row["end_time"]) if row["end_time"] else None
-            )
-            
-            # Load messages
-            messages = self._load_messages(cursor, turn.turn_id)
-            for msg in messages:
+                start_time=from_epoch_us(start_time),
+                end_time=from_epoch_us(end_time)
+            ))
+        
+        # Load messages and tool uses for the whole session at once rather
+        # than issuing two queries per turn
+        messages_by_turn = self._load_messages(cursor, session_id)
+        tool_uses_by_turn = self._load_tool_uses(cursor, session_id)
+        for turn in turns:
+            for msg in messages_by_turn.get(turn.turn_id, []):
                 if msg.role == MessageRole.USER:
                     turn.user_message = msg
                 else:
                     turn.assistant_messages.append(msg)
-            
-            # Load tool uses
-            turn.tool_uses = self._load_tool_uses(cursor, turn.turn_id)
-            
-            turns.append(turn)
+            turn.tool_uses = tool_uses_by_turn.get(turn.turn_id, [])
         
         return turns
     
-    def _load_messages(self, cursor: sqlite3.Cursor, turn_id: str) -> List[Message]:
-        """Load messages for a turn."""
-        cursor.execute(
-            "SELECT * FROM messages WHERE turn_id = ? ORDER BY timestamp",
-            (turn_id,)
-        )
-        messages = []
-        for row in cursor.fetchall():
-            content_data = json.loads(row["content"]) if row["content"] else []
-            content = [ContentBlock.from_dict(c) for c in content_data]
-            
+    def _load_messages(
+        self,
+        cursor: sqlite3.Cursor,
+        session_id: str
+    ) -> Dict[str, List[Message]]:
+        """Load messages for a session, grouped by turn ID."""
+        rows = self._iter_rows(cursor, """
+            SELECT m.turn_id, m.message_id, m.role, m.content, mo.name,
+                   m.timestamp, m.input_tokens, m.output_tokens,
+                   m.cache_read_tokens, m.cache_creation_tokens, m.raw_data
+            FROM messages m
+            JOIN turns t ON m.turn_id = t.turn_id
+            LEFT JOIN models mo ON m.model_id = mo.model_id
+            WHERE t.session_id = ?
+            ORDER BY m.timestamp
+        """, (session_id,))
+        messages_by_turn: Dict[str, List[Message]] = {}
+        for (turn_id, message_id, role, content, model, timestamp,
+             input_tokens, output_tokens, cache_read_tokens,
+             cache_creation_tokens, raw_data) in rows:
             usage = TokenUsage(
-                input_tokens=row["input_tokens"] or 0,
-                output_tokens=row["output_tokens"] or 0,
-                cache_read_tokens=row["cache_read_tokens"] or 0,
-                cache_creation_tokens=row["cache_creation_tokens"] or 0
+                input_tokens=input_tokens or 0,
+                output_tokens=output_tokens or 0,
+                cache_read_tokens=cache_read_tokens or 0,
+                cache_creation_tokens=cache_creation_tokens or 0
             )
             
-            messages.append(Message(
-                message_id=row["message_id"],
-                role=MessageRole(row["role"]),
-                content=content,
-                model=row["model"],
-                timestamp=parse_timestamp(row["timestamp"]),
+            message = _StoredMessage(
+                message_id=message_id,
+                role=MessageRole(role),
+                content=_PENDING,
+                model=model,
+                timestamp=from_epoch_us(timestamp),
                 usage=usage,
-                raw_data=json.loads(row["raw_data"]) if row["raw_data"] else None
-            ))
+                raw_data=_PENDING if raw_data else None
+            )
+            message._stored_content = content
+            message._stored_raw_data = raw_data
+            messages_by_turn.setdefault(turn_id, []).append(message)
         
-        return messages
+        return messages_by_turn
     
-    def _load_tool_uses(self, cursor: sqlite3.Cursor, turn_id: str) -> List[ToolUse]:
-        """Load tool uses for a turn."""
-        cursor.execute(
-            "SELECT * FROM tool_uses WHERE turn_id = ? ORDER BY start_time",
-            (turn_id,)
-        )
-        tools = []
-        for row in cursor.fetchall():
-            tools.append(ToolUse(
-                tool_id=row["tool_id"],
-                tool_name=row["tool_name"],
-                input_data=json.loads(row["input_data"]) if row["input_data"] else {},
-                output_data=row["output_data"],
-                start_time=parse_timestamp(row["start_time"]) if row["start_time"] else None,
-                end_time=parse_timestamp(row["end_time"]) if row["end_time"] else None,
-                success=bool(row["success"]),
-                error=row["error"]
+    def _load_tool_uses(
+        self,
+        cursor: sqlite3.Cursor,
+        session_id: str
+    ) -> Dict[str, List[ToolUse]]:
+        """Load tool uses for a session, grouped by turn ID."""
+        rows = self._iter_rows(cursor, """
+            SELECT tu.turn_id, tu.tool_id, tn.name, tu.input_data,
+                   tu.output_data, tu.start_time, tu.end_time, tu.success,
+                   tu.error
+            FROM tool_uses tu
+            JOIN tool_names tn ON tu.tool_name_id = tn.tool_name_id
+            WHERE tu.session_id = ?
+            ORDER BY tu.start_time
+        """, (session_id,))
+        tool_uses_by_turn: Dict[str, List[ToolUse]] = {}
+        for (turn_id, tool_id, tool_name, input_data, output_data, start_time,
+             end_time, success, error) in rows:
+            tool_uses_by_turn.setdefault(turn_id, []).append(ToolUse(
+                tool_id=tool_id,
+                tool_name=tool_name,
+                input_data=json_loads(_decompress_text(input_data)) if input_data else {},
+                output_data=_decompress_text(output_data),
+                start_time=from_epoch_us(start_time),
+                end_time=from_epoch_us(end_time),
+                success=bool(success),
+                error=error
             ))
-        return tools
+        return tool_uses_by_turn
     
     def list_sessions(
         self, 
@@ -442,101 +1721,66 @@ class TraceStorage:
         Returns:
             List of session summaries
         """
-        conn = self._get_connection()
-        try:
+        with self._read_connection() as conn:
             cursor = conn.cursor()
             
             if since:
                 cursor.execute("""
-                    SELECT s.*, 
-                           COUNT(DISTINCT t.turn_id) as turn_count,
-                           COUNT(DISTINCT tu.tool_id) as tool_count
-                    FROM sessions s
-                    LEFT JOIN turns t ON s.session_id = t.session_id
-                    LEFT JOIN tool_uses tu ON t.turn_id = tu.turn_id
-                    WHERE s.start_time >= ?
-                    GROUP BY s.session_id
-                    ORDER BY s.start_time DESC
+                    SELECT session_id, start_time, end_time, total_duration_ms,
+                           turn_count, tool_count
+                    FROM sessions
+                    WHERE start_time >= ?
+                    ORDER BY start_time DESC
                     LIMIT ?
-                """, (since.isoformat(), limit))
+                """, (to_epoch_us(since), limit))
             else:
                 cursor.execute("""
-                    SELECT s.*, 
-                           COUNT(DISTINCT t.turn_id) as turn_count,
-                           COUNT(DISTINCT tu.tool_id) as tool_count
-                    FROM sessions s
-                    LEFT JOIN turns t ON s.session_id = t.session_id
-                    LEFT JOIN tool_uses tu ON t.turn_id = tu.turn_id
-                    GROUP BY s.session_id
-                    ORDER BY s.start_time DESC
+                    SELECT session_id, start_time, end_time, total_duration_ms,
+                           turn_count, tool_count
+                    FROM sessions
+                    ORDER BY start_time DESC
                     LIMIT ?
                 """, (limit,))
             
-            sessions = []
-            for row in cursor.fetchall():
-                sessions.append({
-                    "session_id": row["session_id"],
-                    "start_time": row["start_time"],
-                    "end_time": row["end_time"],
-                    "duration_ms": row["total_duration_ms"],
-                    "turn_count": row["turn_count"],
-                    "tool_count": row["tool_count"]
-                })
-            
-            return sessions
-        finally:
-            conn.close()
+            return [
+                {
+                    "session_id": session_id,
+                    "start_time": _isoformat_us(start_time) or "",
+                    "end_time": _isoformat_us(end_time),
+                    "duration_ms": duration_ms,
+                    "turn_count": turn_count,
+                    "tool_count": tool_count
+                }
+                for (session_id, start_time, end_time, duration_ms,
+                     turn_count, tool_count) in cursor
+            ]
     
     def delete_session(self, session_id: str) -> bool:
         """
         Delete a session and all its data.
         
+        With background_writes, queued saves are flushed first, so a
+        session saved just before is deleted rather than written after.
+        
         Args:
             session_id: Session ID to delete
             
         Returns:
             True if session was deleted, False if not found
         """
-        conn = self._get_connection()
-        try:
+        if self._writer is not None:
+            self.flush()
+        
+        with self._write_connection() as conn:
             cursor = conn.cursor()
             
-            # Check if session exists
-            cursor.execute(
-                "SELECT 1 FROM sessions WHERE session_id = ?",
-                (session_id,)
-            )
-            if not cursor.fetchone():
-                return False
-            
-            # Delete tool uses
-            cursor.execute("""
-                DELETE FROM tool_uses 
-                WHERE turn_id IN (SELECT turn_id FROM turns WHERE session_id = ?)
-            """, (session_id,))
-            
-            # Delete messages
-            cursor.execute("""
-                DELETE FROM messages 
-                WHERE turn_id IN (SELECT turn_id FROM turns WHERE session_id = ?)
-            """, (session_id,))
-            
-            # Delete turns
-            cursor.execute(
-                "DELETE FROM turns WHERE session_id = ?",
-                (session_id,)
-            )
-            
-            # Delete session
+            # Turns, messages and tool uses go with it via ON DELETE CASCADE;
+            # a single statement is atomic without an explicit transaction.
             cursor.execute(
                 "DELETE FROM sessions WHERE session_id = ?",
                 (session_id,)
             )
-            
-            conn.commit()
-            return True
-        finally:
-            conn.close()
+            return cursor.rowcount > 0
     
     def get_tool_stats(
         self, 
@@ -549,48 +1793,61 @@ class TraceStorage:
             session_id: Optional session ID to filter by
             
         Returns:
-            Dictionary of tool name to ToolStats
+            Dictionary of tool name to ToolStats, including min/max and
+            p50/p95 durations computed in SQL
         """
-        conn = self._get_connection()
-        try:
+        with self._read_connection() as conn:
             cursor = conn.cursor()
             
             if session_id:
                 cursor.execute("""
-                    SELECT tool_name, 
+                    SELECT tn.name AS tool_name, 
                            COUNT(*) as call_count,
-                           SUM(duration_ms) as total_duration,
-                           SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as success_count,
-                           SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) as error_count
+                           SUM(tu.duration_ms) as total_duration,
+                           SUM(CASE WHEN tu.success = 1 THEN 1 ELSE 0 END) as success_count,
+                           SUM(CASE WHEN tu.success = 0 THEN 1 ELSE 0 END) as error_count,
+                           MIN(tu.duration_ms) as min_duration,
+                           MAX(tu.duration_ms) as max_duration,
+                           percentile(tu.duration_ms, 0.5) as p50_duration,
+                           percentile(tu.duration_ms, 0.95) as p95_duration
                     FROM tool_uses tu
-                    JOIN turns t ON tu.turn_id = t.turn_id
-                    WHERE t.session_id = ?
-                    GROUP BY tool_name
+                    JOIN tool_names tn ON tu.tool_name_id = tn.tool_name_id
+                    WHERE tu.session_id = ?
+                    GROUP BY tu.tool_name_id
                 """, (session_id,))
             else:
                 cursor.execute("""
-                    SELECT tool_name, 
+                    SELECT tn.name AS tool_name, 
                            COUNT(*) as call_count,
                            SUM(duration_ms) as total_duration,
                            SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as success_count,
-                           SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) as error_count
-                    FROM tool_uses
-                    GROUP BY tool_name
+                           SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) as error_count,
+                           MIN(duration_ms) as min_duration,
+                           MAX(duration_ms) as max_duration,
+                           percentile(duration_ms, 0.5) as p50_duration,
+                           percentile(duration_ms, 0.95) as p95_duration
+                    FROM tool_uses tu
+                    JOIN tool_names tn ON tu.tool_name_id = tn.tool_name_id
+                    GROUP BY tu.tool_name_id
                 """)
             
             stats = {}
-            for row in cursor.fetchall():
-                stats[row["tool_name"]] = ToolStats(
-                    tool_name=row["tool_name"],
-                    call_count=row["call_count"],
-                    total_duration_ms=row["total_duration"] or 0,
-                    success_count=row["success_count"] or 0,
-                    error_count=row["error_count"] or 0
+            for (tool_name, call_count, total_duration, success_count,
+                 error_count, min_duration, max_duration, p50_duration,
+                 p95_duration) in cursor:
+                stats[tool_name] = ToolStats(
+                    tool_name=tool_name,
+                    call_count=call_count,
+                    total_duration_ms=total_duration or 0,
+                    success_count=success_count or 0,
+                    error_count=error_count or 0,
+                    min_duration_ms=min_duration,
+                    max_duration_ms=max_duration,
+                    p50_duration_ms=p50_duration,
+                    p95_duration_ms=p95_duration
                 )
             
             return stats
-        finally:
-            conn.close()
     
     def get_aggregate_token_usage(
         self, 
@@ -605,40 +1862,40 @@ class TraceStorage:
         Returns:
             TokenUsage with aggregate totals
         """
-        conn = self._get_connection()
-        try:
+        with self._read_connection() as conn:
             cursor = conn.cursor()
             
+            # Totals are kept per session by save_session, so this reads
+            # one row, or one row per session, instead of every message
             if session_id:
                 cursor.execute("""
                     SELECT 
-                        SUM(input_tokens) as total_input,
-                        SUM(output_tokens) as total_output,
-                        SUM(cache_read_tokens) as total_cache_read,
-                        SUM(cache_creation_tokens) as total_cache_creation
-                    FROM messages m
-                    JOIN turns t ON m.turn_id = t.turn_id
-                    WHERE t.session_id = ?
+                        total_input_tokens,
+                        total_output_tokens,
+                        total_cache_read_tokens,
+                        total_cache_creation_tokens
+                    FROM sessions
+                    WHERE session_id = ?
                 """, (session_id,))
             else:
                 cursor.execute("""
                     SELECT 
-                        SUM(input_tokens) as total_input,
-                        SUM(output_tokens) as total_output,
-                        SUM(cache_read_tokens) as total_cache_read,
-                        SUM(cache_creation_tokens) as total_cache_creation
-                    FROM messages
+                        SUM(total_input_tokens),
+                        SUM(total_output_tokens),
+                        SUM(total_cache_read_tokens),
+                        SUM(total_cache_creation_tokens)
+                    FROM sessions
                 """)
             
-            row = cursor.fetchone()
+            total_input, total_output, total_cache_read, total_cache_creation = (
+                cursor.fetchone() or (0, 0, 0, 0)
+            )
             return TokenUsage(
-                input_tokens=row["total_input"] or 0,
-                output_tokens=row["total_output"] or 0,
-                cache_read_tokens=row["total_cache_read"] or 0,
-                cache_creation_tokens=row["total_cache_creation"] or 0
+                input_tokens=total_input or 0,
+                output_tokens=total_output or 0,
+                cache_read_tokens=total_cache_read or 0,
+                cache_creation_tokens=total_cache_creation or 0
             )
-        finally:
-            conn.close()
     
     def save_otel_metrics(self, session_id: str, metrics_data: Dict[str, Any]) -> None:
         """
@@ -648,56 +1905,64 @@ class TraceStorage:
             session_id: Session ID
             metrics_data: Dictionary with metrics data from OtelSessionMetrics.to_dict()
         """
-        conn = self._get_connection()
-        try:
-            cursor = conn.cursor()
-            
-            # Save summary
-            summary = metrics_data.get('summary', {})
-            collected_at = metrics_data.get('collected_at') or datetime.now().isoformat()
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO otel_session_summary
-                (session_id, input_tokens, output_tokens, cache_read_tokens,
-                 cache_creation_tokens, api_calls, api_latency_ms, tool_calls,
-                 errors, collected_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                session_id,
-                summary.get('input_tokens', 0),
-                summary.get('output_tokens', 0),
-                summary.get('cache_read_tokens', 0),
-                summary.get('cache_creation_tokens', 0),
-                summary.get('api_calls', 0),
-                summary.get('api_latency_ms', 0),
-                summary.get('tool_calls', 0),
-                summary.get('errors', 0),
-                collected_at
+        if self._write_queue is not None:
+            self._write_queue.put((self._write_otel_metrics, (session_id, metrics_data)))
+            return
+        
+        with self._write_transaction() as cursor:
+            self._write_otel_metrics(cursor, session_id, metrics_data)
+    
+    def _write_otel_metrics(
+        self,
+        cursor: sqlite3.Cursor,
+        session_id: str,
+        metrics_data: Dict[str, Any]
+    ) -> None:
+        """Write OTEL metrics inside the caller's transaction."""
+        # Save summary
+        summary = metrics_data.get('summary', {})
+        collected_at = metrics_data.get('collected_at') or datetime.now().isoformat()
+        
+        cursor.execute(_UPSERT_OTEL_SUMMARY_SQL, (
+            session_id,
+            summary.get('input_tokens', 0),
+            summary.get('output_tokens', 0),
+            summary.get('cache_read_tokens', 0),
+            summary.get('cache_creation_tokens', 0),
+            summary.get('api_calls', 0),
+            summary.get('api_latency_ms', 0),
+            summary.get('tool_calls', 0),
+            summary.get('errors', 0),
+            collected_at
+        ))
+        
+        # Save individual metrics; type/unit/description are stored
+        # once per metric name rather than on every data point
+        rows = []
+        for name, metric in metrics_data.get('metrics', {}).items():
+            cursor.execute(_UPSERT_OTEL_METRIC_DEF_SQL, (
+                name,
+                metric.get('type', 'counter'),
+                metric.get('unit', ''),
+                metric.get('description', '')
             ))
+            cursor.execute(_SELECT_METRIC_DEF_ID_SQL, (name,))
+            metric_def_id = cursor.fetchone()[0]
             
-            # Save individual metrics
-            for name, metric in metrics_data.get('metrics', {}).items():
-                for dp in metric.get('data_points', []):
-                    cursor.execute("""
-                        INSERT INTO otel_metrics
-                        (session_id, metric_name, metric_value, metric_type,
-                         unit, description, attributes, timestamp, collected_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        session_id,
-                        name,
-                        dp.get('value', 0),
-                        metric.get('type', 'counter'),
-                        metric.get('unit', ''),
-                        metric.get('description', ''),
-                        json.dumps(dp.get('attributes', {})),
-                        dp.get('timestamp'),
-                        collected_at
-                    ))
-            
-            conn.commit()
-        finally:
-            conn.close()
+            for dp in metric.get('data_points', []):
+                # The saved text is what get_otel_metrics() returns; the
+                # epoch value orders data points and filters by time
+                timestamp = dp.get('timestamp')
+                rows.append((
+                    session_id,
+                    metric_def_id,
+                    dp.get('value', 0),
+                    json_dumps(dp.get('attributes', {})),
+                    _otel_epoch_us(timestamp) if timestamp else None,
+                    timestamp,
+                    collected_at
+                ))
+        cursor.executemany(_INSERT_OTEL_METRIC_SQL, rows)
     
     def get_otel_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -709,33 +1974,16 @@ class TraceStorage:
         Returns:
             Dictionary with OTEL summary or None if not found
         """
-        conn = self._get_connection()
-        try:
+        with self._read_connection() as conn:
             cursor = conn.cursor()
             
-            cursor.execute(
-                "SELECT * FROM otel_session_summary WHERE session_id = ?",
-                (session_id,)
-            )
+            cursor.execute(_SELECT_OTEL_SUMMARY_SQL, (session_id,))
             row = cursor.fetchone()
             
             if not row:
                 return None
             
-            return {
-                "session_id": row["session_id"],
-                "input_tokens": row["input_tokens"],
-                "output_tokens": row["output_tokens"],
-                "cache_read_tokens": row["cache_read_tokens"],
-                "cache_creation_tokens": row["cache_creation_tokens"],
-                "api_calls": row["api_calls"],
-                "api_latency_ms": row["api_latency_ms"],
-                "tool_calls": row["tool_calls"],
-                "errors": row["errors"],
-                "collected_at": row["collected_at"]
-            }
-        finally:
-            conn.close()
+            return dict(zip(_OTEL_SUMMARY_COLUMNS, row))
     
     def get_otel_metrics(self, session_id: str) -> List[Dict[str, Any]]:
         """
@@ -747,32 +1995,163 @@ class TraceStorage:
         Returns:
             List of metric dictionaries
         """
-        conn = self._get_connection()
+        return list(self.iter_otel_metrics(session_id))
+    
+    def iter_otel_metrics(
+        self,
+        session_id: str,
+        batch_size: int = _OTEL_METRICS_FETCH_SIZE
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over the OTEL metrics for a session.
+        
+        Rows are fetched batch_size at a time, so only one batch is held in
+        memory. The read connection is returned to the pool once the
+        iterator is exhausted or closed.
+        
+        Args:
+            session_id: Session ID
+            batch_size: Rows fetched from SQLite per batch
+            
+        Yields:
+            Metric dictionaries ordered by metric name, then timestamp
+        """
+        with self._read_connection() as conn:
+            cursor = conn.execute("""
+                SELECT d.metric_name, m.metric_value, d.metric_type, d.unit,
+                       d.description, m.attributes, m.timestamp_text,
+                       m.timestamp, m.collected_at
+                FROM otel_metrics m
+                JOIN otel_metric_defs d ON m.metric_def_id = d.metric_def_id
+                WHERE m.session_id = ?
+                ORDER BY d.metric_name, m.timestamp
+            """, (session_id,))
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for (metric_name, metric_value, metric_type, unit,
+                         description, attributes, timestamp_text,
+                         timestamp, collected_at) in rows:
+                        yield {
+                            "metric_name": metric_name,
+                            "metric_value": metric_value,
+                            "metric_type": metric_type,
+                            "unit": unit,
+                            "description": description,
+                            "attributes": json_loads(attributes) if attributes else {},
+                            # Rows saved before v12 only have the epoch value
+                            "timestamp": (
+                                timestamp_text if timestamp_text is not None
+                                else _isoformat_us(timestamp)
+                            ),
+                            "collected_at": collected_at
+                        }
+            finally:
+                # Ends the read transaction if the caller stops early
+                cursor.close()
+    
+    def get_otel_metric_attribute(
+        self,
+        session_id: str,
+        metric_name: str,
+        json_path: str
+    ) -> List[Any]:
+        """
+        Get one attribute of every data point of a session's metric.
+        
+        The attribute is extracted by SQLite's json_extract(), so the
+        attributes of each data point are never decoded in Python.
+        
+        Args:
+            session_id: Session ID
+            metric_name: Metric name
+            json_path: SQLite JSON path into the attributes, e.g. '$.model'
+            
+        Returns:
+            Attribute values in timestamp order; None where a data point
+            lacks the attribute, and JSON text for objects and arrays
+        """
+        with self._read_connection() as conn:
+            cursor = conn.execute("""
+                SELECT json_extract(m.attributes, ?)
+                FROM otel_metrics m
+                JOIN otel_metric_defs d ON m.metric_def_id = d.metric_def_id
+                WHERE m.session_id = ? AND d.metric_name = ?
+                ORDER BY m.timestamp
+            """, (json_path, session_id, metric_name))
+            return [value for (value,) in cursor]
+    
+    def export_parquet(self, path: str, since: Optional[datetime] = None) -> int:
+        """
+        Export OTEL metric data points to a Parquet file.
+        
+        Rows are streamed in 64K-row batches, each written as a
+        Snappy-compressed row group. Repetitive string columns are
+        dictionary-encoded. Requires the optional pyarrow dependency.
+        
+        Args:
+            path: Output Parquet file path
+            since: Only export data points timestamped at or after this time
+            
+        Returns:
+            Number of data points written
+        """
         try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError(
+                "Parquet export requires pyarrow: "
+                "pip install 'claude-trace[parquet]'"
+            ) from e
+        
+        string_dict = pa.dictionary(pa.int32(), pa.string())
+        schema = pa.schema([
+            ("session_id", string_dict),
+            ("metric_name", string_dict),
+            ("metric_type", string_dict),
+            ("unit", string_dict),
+            ("metric_value", pa.float64()),
+            ("timestamp", pa.timestamp("us")),
+            ("attributes", pa.string()),
+        ])
+        
+        with self._read_connection() as conn:
             cursor = conn.cursor()
+            sql = """
+                SELECT m.session_id, d.metric_name, d.metric_type, d.unit,
+                       m.metric_value, m.timestamp, m.attributes
+                FROM otel_metrics m
+                JOIN otel_metric_defs d ON m.metric_def_id = d.metric_def_id
+            """
+            params: tuple = ()
+            if since:
+                sql += " WHERE m.timestamp >= ?"
+                params = (to_epoch_us(since),)
+            rows = self._iter_rows(cursor, sql + " ORDER BY m.id", params)
             
-            cursor.execute(
-                """SELECT * FROM otel_metrics WHERE session_id = ? 
-                   ORDER BY metric_name, timestamp""",
-                (session_id,)
-            )
+            written = 0
+            with pq.ParquetWriter(path, schema, compression="snappy") as writer:
+                while True:
+                    batch_rows = rows.fetchmany(_PARQUET_ROW_GROUP_SIZE)
+                    if not batch_rows:
+                        break
+                    columns = list(zip(*batch_rows))
+                    arrays = [
+                        pa.array(columns[i], type=pa.string()).dictionary_encode()
+                        for i in range(4)
+                    ]
+                    arrays.append(pa.array(columns[4], type=pa.float64()))
+                    arrays.append(pa.array(columns[5], type=pa.timestamp("us")))
+                    arrays.append(pa.array(columns[6], type=pa.string()))
+                    writer.write_batch(
+                        pa.RecordBatch.from_arrays(arrays, schema=schema)
+                    )
+                    written += len(batch_rows)
             
-            metrics = []
-            for row in cursor.fetchall():
-                metrics.append({
-                    "metric_name": row["metric_name"],
-                    "metric_value": row["metric_value"],
-                    "metric_type": row["metric_type"],
-                    "unit": row["unit"],
-                    "description": row["description"],
-                    "attributes": json.loads(row["attributes"]) if row["attributes"] else {},
-                    "timestamp": row["timestamp"],
-                    "collected_at": row["collected_at"]
-                })
-            
-            return metrics
-        finally:
-            conn.close()
+            return written
     
     def get_aggregate_otel_metrics(self) -> Dict[str, Any]:
         """
@@ -781,39 +2160,24 @@ class TraceStorage:
         Returns:
             Dictionary with aggregate metrics
         """
-        conn = self._get_connection()
-        try:
+        with self._read_connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute("""
-                SELECT 
-                    SUM(input_tokens) as total_input_tokens,
-                    SUM(output_tokens) as total_output_tokens,
-                    SUM(cache_read_tokens) as total_cache_read_tokens,
-                    SUM(cache_creation_tokens) as total_cache_creation_tokens,
-                    SUM(api_calls) as total_api_calls,
-                    AVG(api_latency_ms) as avg_api_latency_ms,
-                    SUM(tool_calls) as total_tool_calls,
-                    SUM(errors) as total_errors,
-                    COUNT(*) as session_count
-                FROM otel_session_summary
+                SELECT input_tokens, output_tokens, cache_read_tokens,
+                       cache_creation_tokens, api_calls,
+                       api_latency_ms / NULLIF(api_latency_count, 0),
+                       tool_calls, errors, session_count
+                FROM otel_global_totals
+                WHERE id = 1
             """)
             
-            row = cursor.fetchone()
-            
-            return {
-                "input_tokens": row["total_input_tokens"] or 0,
-                "output_tokens": row["total_output_tokens"] or 0,
-                "cache_read_tokens": row["total_cache_read_tokens"] or 0,
-                "cache_creation_tokens": row["total_cache_creation_tokens"] or 0,
-                "api_calls": row["total_api_calls"] or 0,
-                "api_latency_ms": row["avg_api_latency_ms"] or 0,
-                "tool_calls": row["total_tool_calls"] or 0,
-                "errors": row["total_errors"] or 0,
-                "session_count": row["session_count"] or 0
-            }
-        finally:
-            conn.close()
+            keys = (
+                "input_tokens", "output_tokens", "cache_read_tokens",
+                "cache_creation_tokens", "api_calls", "api_latency_ms",
+                "tool_calls", "errors", "session_count",
+            )
+            return {key: value or 0 for key, value in zip(keys, cursor.fetchone())}
     
     def has_otel_metrics(self, session_id: str) -> bool:
         """
@@ -825,13 +2189,11 @@ class TraceStorage:
         Returns:
             True if session has OTEL metrics
         """
-        conn = self._get_connection()
-        try:
+        with self._read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "SELECT 1 FROM otel_session_summary WHERE session_id = ?",
+                "SELECT EXISTS (SELECT 1 FROM otel_session_summary "
+                "WHERE session_id = ?)",
                 (session_id,)
             )
-            return cursor.fetchone() is not None
-        finally:
-            conn.close()
+            return bool(cursor.fetchone()[0])
@@ -2,9 +2,38 @@
 Utility functions for Claude Code local tracing.
 """
 
+import dataclasses
+import json
+import math
 import re
-from datetime import datetime
-from typing import Optional
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # optional speedup: pip install 'claude-trace[fast]'
+    orjson = None
+
+
+_EPOCH = datetime(1970, 1, 1)
+_ONE_MICROSECOND = timedelta(microseconds=1)
+
+# strptime() formats tried when fromisoformat() rejects a timestamp
+_TIMESTAMP_FORMATS = (
+    "%Y-%m-%dT%H:%M:%S.%f",  # With microseconds
+    "%Y-%m-%dT%H:%M:%S",     # Without microseconds
+    "%Y-%m-%d %H:%M:%S.%f",  # Space separator with microseconds
+    "%Y-%m-%d %H:%M:%S",     # Space separator without microseconds
+)
+_TIMESTAMP_PARTS_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2})T?(\d{2}):(\d{2}):(\d{2})')
+# Strings in one of the _TIMESTAMP_FORMATS shapes, for which fromisoformat()
+# gives the same result as strptime(); it also accepts date-only, basic,
+# week-date and other forms that the formats reject
+_TIMESTAMP_FAST_RE = re.compile(r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d{1,6})?')
+_MODEL_DATE_SUFFIX_RE = re.compile(r'-\d{8}$')
 
 
 def parse_timestamp(timestamp_str: str) -> datetime:
@@ -22,40 +51,166 @@ def parse_timestamp(timestamp_str: str) -> datetime:
     Returns:
         datetime object
     """
-    if not timestamp_str:
-        return datetime.now()
+    if timestamp_str:
+        parsed = _parse_timestamp_cached(timestamp_str)
+        if parsed is not None:
+            return parsed
     
+    # Last resort: return current time
+    return datetime.now()
+
+
+# Timestamps repeat across a transcript's user, assistant and tool result
+# entries. datetimes are immutable, so cached results can be shared.
+@lru_cache(maxsize=4096)
+def _parse_timestamp_cached(timestamp_str: str) -> Optional[datetime]:
+    """Parse a non-empty timestamp string, or return None if unparseable."""
     # Remove trailing Z and replace with +00:00 for parsing
     ts = timestamp_str.rstrip('Z')
     
+    # fromisoformat() is implemented in C; anything outside the strptime()
+    # shapes, including offsets, is left to the fallbacks below
+    if _TIMESTAMP_FAST_RE.fullmatch(ts):
+        try:
+            return datetime.fromisoformat(ts)
+        except ValueError:
+            pass
+    
     # Try different formats
-    formats = [
-        "%Y-%m-%dT%H:%M:%S.%f",  # With microseconds
-        "%Y-%m-%dT%H:%M:%S",     # Without microseconds
-        "%Y-%m-%d %H:%M:%S.%f",  # Space separator with microseconds
-        "%Y-%m-%d %H:%M:%S",     # Space separator without microseconds
-    ]
-    
-    for fmt in formats:
+    for fmt in _TIMESTAMP_FORMATS:
         try:
             return datetime.strptime(ts, fmt)
         except ValueError:
             continue
     
     # Fallback: try to extract just the date/time parts
-    match = re.match(r'(\d{4})-(\d{2})-(\d{2})T?(\d{2}):(\d{2}):(\d{2})', timestamp_str)
+    match = _TIMESTAMP_PARTS_RE.match(timestamp_str)
     if match:
-        return datetime(
-            int(match.group(1)),
-            int(match.group(2)),
-            int(match.group(3)),
-            int(match.group(4)),
-            int(match.group(5)),
-            int(match.group(6))
+        return datetime(*map(int, match.groups()))
+    
+    return None
+
+
+def to_epoch_us(dt: Optional[datetime]) -> Optional[int]:
+    """
+    Convert a datetime to integer microseconds since the Unix epoch.
+    
+    Naive datetimes are treated as UTC, matching parse_timestamp() which
+    strips the trailing 'Z'. Integer arithmetic keeps the conversion exact.
+    
+    Args:
+        dt: Datetime to convert
+        
+    Returns:
+        Microseconds since epoch, or None if dt is None
+    """
+    if dt is None:
+        return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return (dt - _EPOCH) // _ONE_MICROSECOND
+
+
+def from_epoch_us(us: Optional[int]) -> Optional[datetime]:
+    """
+    Convert integer microseconds since the Unix epoch to a naive datetime.
+    
+    Inverse of to_epoch_us().
+    
+    Args:
+        us: Microseconds since epoch
+        
+    Returns:
+        Naive (UTC) datetime, or None if us is None
+    """
+    if us is None:
+        return None
+    return _EPOCH + timedelta(microseconds=us)
+
+
+def _json_default(obj: Any) -> Any:
+    """Encode the non-JSON types orjson supports natively the way it does."""
+    if isinstance(obj, (date, time)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return _finite(dataclasses.asdict(obj))
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _finite(obj: Any) -> Any:
+    """Replace NaN and infinite floats with None, as orjson writes them."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+    return obj
+
+
+def json_dumps(obj: Any) -> str:
+    """
+    Encode an object as compact JSON.
+    
+    Uses orjson when it is installed, falling back to the json module for
+    values orjson rejects, such as integers wider than 64 bits. Both
+    produce the same output: dates, times, UUIDs, enums and dataclasses
+    are encoded as orjson encodes them, and NaN and infinite floats are
+    written as null rather than as the non-standard NaN literals.
+    
+    Args:
+        obj: JSON-serializable object
+        
+    Returns:
+        JSON string without insignificant whitespace
+        
+    Raises:
+        TypeError: If obj contains a value of an unsupported type
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            pass
+    try:
+        return json.dumps(
+            obj, separators=(",", ":"), allow_nan=False, default=_json_default
         )
+    except ValueError:
+        # Non-finite floats are rare, so only then is a cleaned copy made
+        return json.dumps(
+            _finite(obj), separators=(",", ":"), allow_nan=False,
+            default=_json_default
+        )
+
+
+def json_loads(s: Union[str, bytes]) -> Any:
+    """
+    Decode a JSON document.
     
-    # Last resort: return current time
-    return datetime.now()
+    Uses orjson when it is installed, falling back to the json module for
+    input orjson rejects, such as the NaN and Infinity literals json.dumps
+    writes.
+    
+    Args:
+        s: JSON text
+        
+    Returns:
+        Decoded object
+        
+    Raises:
+        json.JSONDecodeError: If s is not valid JSON
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(s)
+        except ValueError:
+            pass
+    return json.loads(s)
 
 
 def format_duration(ms: Optional[int]) -> str:
@@ -170,8 +325,7 @@ def clean_model_name(model: str) -> str:
         return "unknown"
     
     # Remove date suffix (YYYYMMDD pattern at the end)
-    cleaned = re.sub(r'-\d{8}$', '', model)
-    return cleaned
+    return _MODEL_DATE_SUFFIX_RE.sub('', model)
 
 
 def generate_id() -> str:
@@ -181,7 +335,6 @@ def generate_id() -> str:
     Returns:
         UUID-like string
     """
-    import uuid
     return str(uuid.uuid4())
 
 
@@ -195,9 +348,8 @@ def safe_json_loads(s: str) -> Optional[dict]:
     Returns:
         Parsed dictionary or None
     """
-    import json
     try:
-        return json.loads(s)
+        return json_loads(s)
     except (json.JSONDecodeError, TypeError):
         return None
 
@@ -223,3 +375,33 @@ def get_nested(data: dict, *keys, default=None):
         if current is None:
             return default
     return current
+
+
+def make_getter(*keys, default=None) -> Callable[[dict], Any]:
+    """
+    Build a function that gets a fixed nested path from a dictionary.
+    
+    The returned getter behaves like get_nested(data, *keys, default=default)
+    for string keys, but indexes directly and relies on KeyError/TypeError
+    for missing keys and non-dict intermediates, which is much cheaper
+    when the path is usually present.
+    
+    Args:
+        *keys: Keys to traverse (at least one)
+        default: Default value if not found
+        
+    Returns:
+        Function taking the dictionary and returning the value or default
+    """
+    first, *rest = keys
+    
+    def getter(data: dict) -> Any:
+        try:
+            value = data[first]
+            for key in rest:
+                value = value[key]
+        except (KeyError, TypeError):
+            return default
+        return default if value is None else value
+    
+    return getter
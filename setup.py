@@ -24,6 +24,12 @@ setup(
             "pytest>=8.0.0",
             "pytest-cov>=4.0.0",
         ],
+        "parquet": [
+            "pyarrow>=10.0.0",
+        ],
+        "fast": [
+            "orjson>=3.6.0",
+        ],
     },
     entry_points={
         "console_scripts": [
@@ -55,15 +55,22 @@ def isolated_env(monkeypatch, temp_state_file, tmp_path):
 # Helper Class Fixtures
 # =============================================================================
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def bash_executor():
     """
     Provide BashRunner for executing bash functions in isolation.
 
+    One runner, and so one persistent bash process, is shared by the whole
+    session (per worker under xdist). Each call still runs in a fresh
+    subshell with the current test's environment and working directory,
+    so functions cannot leak state between tests.
+
     Returns:
         BashRunner instance
     """
-    return BashRunner()  # Uses auto-detection
+    runner = BashRunner()  # Uses auto-detection
+    yield runner
+    runner.close()
 
 
 @pytest.fixture
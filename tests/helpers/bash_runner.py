@@ -4,48 +4,235 @@ BashRunner - Execute bash functions from stop_hook.sh in isolation for unit test
 This helper enables testing individual bash functions without executing the main script.
 """
 
+import json
 import os
+import re
+import select
 import shlex
+import shutil
 import subprocess
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _find_script() -> Path:
+    """Locate stop_hook.sh, preferring the copy in this repository."""
+    repo_root = Path(__file__).resolve().parents[2]
+    possible_paths = [
+        repo_root / "stop_hook.sh",
+        Path.home() / "tracing-claude-code" / "stop_hook.sh",
+    ]
+    for path in possible_paths:
+        if path.exists():
+            return path
+    # Use the repository path as default
+    return possible_paths[0]
+
+
+# stop_hook.sh, located once at import rather than by every runner
+_SCRIPT_PATH = _find_script()
+
+# bash, resolved once rather than looked up on PATH for every process
+_BASH = shutil.which("bash") or "/bin/bash"
+
+# Environment overrides applied to every function call
+_TEST_ENV = {
+    "TRACE_TO_LANGSMITH": "false",  # Disable hook during testing
+    "CC_LANGSMITH_DEBUG": "false",  # Disable debug logging
+}
+
+# shlex.quote for the arguments, paths and env values quoted on every call,
+# which mostly repeat (session IDs, fixture JSON, the stdin/stderr paths)
+_quote = lru_cache(maxsize=1024)(shlex.quote)
+
+# Parts of stop_hook.sh removed before sourcing it: the early exit when
+# tracing is disabled, and the trailing call to main
+_STRIP_RE = (
+    re.compile(r'(?ms)^# Exit early if tracing disabled\n.*?^fi\n'),
+    re.compile(r'(?ms)^main\n.*\Z'),
+)
+
+# A top-level function definition, from its header to the closing brace
+_FUNCTION_RE = re.compile(r'(?ms)^[A-Za-z_][A-Za-z0-9_]*\(\) \{\n.*?^\}\n')
 
 
 class BashRunner:
     """Execute bash functions from stop_hook.sh in isolation"""
 
-    # Default path relative to the repository root
-    DEFAULT_SCRIPT_PATH = None
+    # Default path, found relative to the repository root
+    DEFAULT_SCRIPT_PATH = _SCRIPT_PATH
     
     def __init__(self, script_path: str = None):
         if script_path is None:
-            # Try to find stop_hook.sh in common locations
-            import pathlib
-            repo_root = pathlib.Path(__file__).parent.parent.parent
-            possible_paths = [
-                repo_root / "stop_hook.sh",
-                pathlib.Path.home() / "tracing-claude-code" / "stop_hook.sh",
-            ]
-            for path in possible_paths:
-                if path.exists():
-                    script_path = str(path)
-                    break
-            else:
-                # Use the repository path as default
-                script_path = str(repo_root / "stop_hook.sh")
+            script_path = str(_SCRIPT_PATH)
         
         self.script_path = script_path
         if not Path(script_path).exists():
             raise FileNotFoundError(f"Script not found: {script_path}")
 
-    def call_function(self, func_name: str, *args: str, stdin: Optional[str] = None) -> str:
+        # Strip the script once into two files: the function definitions,
+        # sourced once by a persistent bash process, and the remaining
+        # top-level config, re-run for each call since it reads the
+        # environment (STATE_FILE, API key) and installs the EXIT trap
+        self._tmpdir = tempfile.mkdtemp(prefix="bash_runner_")
+        self._finalizer = weakref.finalize(
+            self, shutil.rmtree, self._tmpdir, ignore_errors=True
+        )
+        self._definitions_path, self._config_path = self._write_prelude()
+        self._stdin_path = os.path.join(self._tmpdir, "stdin")
+        self._stderr_path = os.path.join(self._tmpdir, "stderr")
+
+        self._proc: Optional[subprocess.Popen] = None
+        self._base_env: dict = {}
+        self._lock = threading.Lock()
+
+    def _write_prelude(self) -> Tuple[str, str]:
+        """
+        Split stop_hook.sh, minus its early exit and main invocation.
+
+        Returns:
+            Paths of the function definitions and the top-level config scripts
+        """
+        script = Path(self.script_path).read_text()
+        for pattern in _STRIP_RE:
+            script = pattern.sub('', script)
+
+        definitions = "".join(m.group(0) for m in _FUNCTION_RE.finditer(script))
+        config = "set -e\nset -o pipefail\n" + _FUNCTION_RE.sub("", script)
+
+        paths = []
+        for name, content in (("definitions.sh", definitions), ("config.sh", config)):
+            path = os.path.join(self._tmpdir, name)
+            Path(path).write_text(content)
+            paths.append(path)
+        return paths[0], paths[1]
+
+    def _start(self):
+        """Start the persistent bash process and source the definitions."""
+        self._base_env = {**os.environ, **_TEST_ENV}
+        self._proc = subprocess.Popen(
+            [_BASH],
+            executable=_BASH,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=self._base_env,
+            close_fds=False
+        )
+        self._send(f"source {shlex.quote(self._definitions_path)}\n")
+
+    def _stop(self):
+        """Kill the bash process, e.g. after a timeout left it mid-command."""
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.wait()
+            self._proc = None
+
+    def close(self):
+        """Stop the bash process and remove the temporary scripts."""
+        with self._lock:
+            if self._proc is not None:
+                try:
+                    self._send("exit\n")
+                    self._proc.wait(timeout=5)
+                except (OSError, subprocess.TimeoutExpired):
+                    self._proc.kill()
+                    self._proc.wait()
+                self._proc = None
+        self._finalizer()
+
+    def __enter__(self) -> "BashRunner":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _send(self, command: str):
+        """Write a command line to the bash process."""
+        self._proc.stdin.write(command.encode())
+        self._proc.stdin.flush()
+
+    def _env_commands(self) -> str:
+        """
+        Build the commands that bring the bash environment up to date.
+
+        The bash process was started with a snapshot of the environment, so
+        only variables changed since then (e.g. by monkeypatch) are exported
+        or unset; os.environ is compared in place rather than copied.
+        """
+        base_env = self._base_env
+        lines = [
+            f"export {key}={_quote(value)}"
+            for key, value in os.environ.items()
+            if base_env.get(key) != value and key not in _TEST_ENV and key.isidentifier()
+        ]
+        lines.extend(
+            f"unset {key}"
+            for key in base_env
+            if key not in os.environ and key not in _TEST_ENV and key.isidentifier()
+        )
+        lines.append(f"cd {_quote(os.getcwd())}")
+        return "\n".join(lines)
+
+    def _execute(self, command: str, timeout: float) -> Tuple[int, bytes]:
+        """
+        Run a command in the bash process and read its output.
+
+        The command's output is followed by a sentinel line carrying its exit
+        status, tagged with a fresh random id so output cannot fake it.
+
+        Returns:
+            Tuple of (exit status, raw stdout)
+
+        Raises:
+            subprocess.TimeoutExpired: If no sentinel arrives within timeout
+        """
+        if self._proc is None:
+            self._start()
+
+        tag = f"__END_{uuid.uuid4().hex}__".encode()
+        self._send(f"{command}\nprintf '\\n%s %d\\n' {tag.decode()} \"$?\"\n")
+
+        fd = self._proc.stdout.fileno()
+        deadline = time.monotonic() + timeout
+        output = bytearray()
+        while True:
+            end = output.find(b"\n" + tag + b" ")
+            if end >= 0 and output.endswith(b"\n"):
+                status = int(output[end + len(tag) + 2:-1])
+                return status, bytes(output[:end])
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                self._stop()
+                raise subprocess.TimeoutExpired(command, timeout)
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                self._stop()
+                raise RuntimeError("bash process exited unexpectedly")
+            output += chunk
+
+    def call_function(self, func_name: str, *args: str, stdin: Optional[Union[str, bytes]] = None) -> str:
         """
         Call a bash function with arguments.
 
+        Each call runs in a forked subshell of the persistent bash process,
+        so functions cannot leak variables, traps or exits into later calls.
+
         Args:
             func_name: Name of the function to call
             *args: Arguments to pass to the function
-            stdin: Optional stdin input for the function
+            stdin: Optional stdin input for the function, as text or raw bytes
 
         Returns:
             stdout from function execution
@@ -53,58 +240,90 @@ class BashRunner:
         Raises:
             RuntimeError: If the function execution fails
         """
-        # Create a script that sources stop_hook.sh (skip main execution) and calls the function
-        # We use sed to remove everything from 'main' onwards and the early exit check
-        quoted_args = ' '.join(shlex.quote(arg) for arg in args)
+        return self._call(func_name, args, stdin).decode().strip()
+
+    def call_function_json(self, func_name: str, *args: str, stdin: Optional[Union[str, bytes]] = None) -> Any:
+        """
+        Call a bash function and parse its stdout as JSON.
 
-        script = f"""
-        set -e
-        set -o pipefail
+        The raw output bytes are parsed directly, without decoding them to
+        a str first.
 
-        # Source functions from stop_hook.sh (skip main execution and early exit)
-        source <(sed -e '/^# Exit early if tracing disabled$/,/^fi$/d' -e '/^main$/,$d' {shlex.quote(self.script_path)})
+        Args:
+            func_name: Name of the function to call
+            *args: Arguments to pass to the function
+            stdin: Optional stdin input for the function, as text or raw bytes
 
-        # Call target function
-        {func_name} {quoted_args}
-        """
+        Returns:
+            Parsed JSON value
 
-        env = {
-            **os.environ,
-            "TRACE_TO_LANGSMITH": "false",  # Disable hook during testing
-            "CC_LANGSMITH_DEBUG": "false",  # Disable debug logging
-        }
+        Raises:
+            RuntimeError: If the function execution fails
+            json.JSONDecodeError: If stdout is not valid JSON
+        """
+        raw = self._call(func_name, args, stdin).strip()
+        if orjson is not None:
+            try:
+                return orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                pass
+        return json.loads(raw)
+
+    def _call(self, func_name: str, args: Tuple[str, ...], stdin: Optional[Union[str, bytes]]) -> bytes:
+        """Run a bash function in a subshell and return its raw stdout."""
+        quoted_args = ' '.join(_quote(arg) for arg in args)
+        stdin_path = os.devnull if stdin is None else self._stdin_path
 
         try:
-            result = subprocess.run(
-                ["bash", "-c", script],
-                input=stdin,
-                capture_output=True,
-                text=True,
-                timeout=30,
-                env=env
-            )
-
-            if result.returncode != 0:
-                error_msg = f"Function {func_name} failed with exit code {result.returncode}\n"
-                error_msg += f"STDOUT: {result.stdout}\n"
-                error_msg += f"STDERR: {result.stderr}\n"
+            # The environment diff, and the stdin and stderr files shared by
+            # all calls, are built, written and read under the same lock as
+            # the command itself
+            with self._lock:
+                # Start bash first, so the diff is against its environment
+                if self._proc is None:
+                    self._start()
+
+                script = f"""(
+        {self._env_commands()}
+
+        # Run the top-level config of stop_hook.sh (functions are already defined)
+        source {_quote(self._config_path)}
+
+        # Call target function
+        {func_name} {quoted_args}
+        ) <{_quote(stdin_path)} 2>{_quote(self._stderr_path)}"""
+
+                if stdin is not None:
+                    # Bytes are written as-is; text is encoded once, without
+                    # going through a text-mode file wrapper
+                    data = stdin if isinstance(stdin, bytes) else stdin.encode()
+                    with open(stdin_path, "wb") as f:
+                        f.write(data)
+
+                returncode, stdout = self._execute(script, timeout=30)
+                stderr = Path(self._stderr_path).read_text() if returncode != 0 else ""
+
+            if returncode != 0:
+                error_msg = f"Function {func_name} failed with exit code {returncode}\n"
+                error_msg += f"STDOUT: {stdout.decode(errors='replace')}\n"
+                error_msg += f"STDERR: {stderr}\n"
                 error_msg += f"SCRIPT:\n{script}"
                 raise RuntimeError(error_msg)
 
-            return result.stdout.strip()
+            return stdout
 
         except subprocess.TimeoutExpired:
             raise RuntimeError(f"Function {func_name} timed out after 30 seconds")
         except Exception as e:
             raise RuntimeError(f"Failed to execute function {func_name}: {str(e)}")
 
-    def call_with_stdin(self, func_name: str, stdin: str, *args: str) -> str:
+    def call_with_stdin(self, func_name: str, stdin: Union[str, bytes], *args: str) -> str:
         """
         Call function with stdin input (convenience method).
 
         Args:
             func_name: Name of the function to call
-            stdin: Input to pipe to the function
+            stdin: Input to pipe to the function, as text or raw bytes
             *args: Arguments to pass to the function
 
         Returns:
@@ -124,22 +343,13 @@ class BashRunner:
         Returns:
             The function source code
         """
-        script = f"""
-        source <(sed -e '/^# Exit early if tracing disabled$/,/^fi$/d' -e '/^main()/,$d' {shlex.quote(self.script_path)})
-        declare -f {func_name}
-        """
+        with self._lock:
+            returncode, stdout = self._execute(f"declare -f {_quote(func_name)}", timeout=10)
 
-        result = subprocess.run(
-            ["bash", "-c", script],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
-
-        if result.returncode != 0:
+        if returncode != 0:
             raise RuntimeError(f"Function {func_name} not found")
 
-        return result.stdout.strip()
+        return stdout.decode().strip()
 
     def list_functions(self) -> list[str]:
         """
@@ -148,19 +358,12 @@ class BashRunner:
         Returns:
             List of function names
         """
-        script = f"""
-        source <(sed -e '/^# Exit early if tracing disabled$/,/^fi$/d' -e '/^main()/,$d' {shlex.quote(self.script_path)})
-        declare -F | awk '{{print $3}}'
-        """
-
-        result = subprocess.run(
-            ["bash", "-c", script],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
+        with self._lock:
+            returncode, stdout = self._execute("declare -F", timeout=10)
 
-        if result.returncode != 0:
+        if returncode != 0:
             return []
 
-        return [line.strip() for line in result.stdout.strip().split('\n') if line.strip()]
+        # Each line reads "declare -f <name>"
+        names = (line.rpartition(" ")[2] for line in stdout.decode().splitlines())
+        return [name for name in names if name and name != "main"]
@@ -4,41 +4,173 @@ State file management utilities for tests.
 Provides helpers for managing langsmith_state.json during testing.
 """
 
+import contextlib
+import fcntl
 import json
+import os
+import threading
 from pathlib import Path
 from typing import Any, Optional
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dumps(state: dict, pretty: bool = False) -> bytes:
+    """Serialize state as compact or indented JSON, with orjson when available."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(state, option=option)
+        except TypeError:
+            pass
+    if pretty:
+        return json.dumps(state, indent=2).encode()
+    return json.dumps(state, separators=(",", ":")).encode()
+
+
+def _loads(raw: bytes) -> Any:
+    """Parse JSON bytes, with orjson when available."""
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(raw)
+
+
+class _Transaction(threading.local):
+    """Per-thread transaction() state of a StateManager."""
+
+    # Nesting depth of transaction() and the serialized state saved inside
+    # it, written out when the outermost transaction exits
+    depth = 0
+    pending: Optional[bytes] = None
+
 
 class StateManager:
     """Manage langsmith_state.json for tests"""
 
-    def __init__(self, state_file: Path):
+    def __init__(self, state_file: Path, pretty: bool = False):
+        """
+        Initialize the state manager.
+
+        Args:
+            state_file: Path to the state file
+            pretty: Write indented JSON, for reading the file while debugging
+        """
         self.state_file = Path(state_file)
+        self.pretty = pretty
+        self._lock_file = self.state_file.with_name(self.state_file.name + ".lock")
+        # Kept per thread, so a thread never joins another's transaction
+        # without taking the lock itself
+        self._txn = _Transaction()
 
     def load(self) -> dict:
         """
         Load state from file.
 
+        The file is read and parsed on every call, since bash functions
+        under test may rewrite it at any time. Inside a transaction(),
+        state saved so far is returned unwritten.
+
         Returns:
-            State dictionary (empty dict if file doesn't exist)
+            State dictionary (empty dict if file doesn't exist or, outside
+            a transaction, isn't valid JSON)
+
+        Raises:
+            json.JSONDecodeError: If the file isn't valid JSON inside a
+                transaction(), rather than overwriting it with fresh state
         """
-        if not self.state_file.exists():
-            return {}
+        raw = self._txn.pending
+        if raw is None:
+            try:
+                raw = self.state_file.read_bytes()
+            except IOError:
+                return {}
 
         try:
-            return json.loads(self.state_file.read_text())
-        except (json.JSONDecodeError, IOError):
+            return _loads(raw)
+        except json.JSONDecodeError:
+            if self._txn.depth:
+                raise
             return {}
 
     def save(self, state: dict):
         """
         Save state to file.
 
+        Inside a transaction(), the write is deferred until the outermost
+        transaction exits.
+
         Args:
             state: State dictionary to save
         """
+        raw = _dumps(state, self.pretty)
+        if self._txn.depth:
+            self._txn.pending = raw
+        else:
+            self._write(raw)
+
+    def _write(self, raw: bytes):
+        """Write serialized state to the state file."""
         self.state_file.parent.mkdir(parents=True, exist_ok=True)
-        self.state_file.write_text(json.dumps(state, indent=2))
+
+        # Write a sibling temp file and rename it over the state file, so
+        # readers see either the old or the new contents, never a partial
+        # write that fails to parse
+        tmp = self.state_file.with_name(
+            f"{self.state_file.name}.tmp.{os.getpid()}.{threading.get_ident()}"
+        )
+        try:
+            tmp.write_bytes(raw)
+            os.replace(tmp, self.state_file)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Group several updates into one locked read-modify-write.
+
+        Single updates need no lock, since each save replaces the file
+        atomically. The state file's sibling lockfile is held for the
+        outermost transaction, and saves made inside it are written once when it
+        exits. If the block raises, the deferred changes are discarded.
+        Transactions are per thread: other threads block on the lockfile
+        until the outermost transaction exits.
+
+        Example:
+            with state_manager.transaction():
+                state_manager.set_last_line(session_id, 10)
+                state_manager.set_turn_count(session_id, 3)
+        """
+        txn = self._txn
+        if txn.depth:
+            txn.depth += 1
+            try:
+                yield
+            finally:
+                txn.depth -= 1
+            return
+
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self._lock_file, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            txn.depth = 1
+            try:
+                yield
+                if txn.pending is not None:
+                    self._write(txn.pending)
+            finally:
+                txn.depth = 0
+                txn.pending = None
+                fcntl.flock(f, fcntl.LOCK_UN)
 
     def get_session_state(self, session_id: str) -> dict:
         """
@@ -62,11 +194,7 @@ class StateManager:
             **kwargs: Key-value pairs to update in the session state
         """
         state = self.load()
-
-        if session_id not in state:
-            state[session_id] = {}
-
-        state[session_id].update(kwargs)
+        state[session_id] = {**state.get(session_id, {}), **kwargs}
         self.save(state)
 
     def set_session_state(self, session_id: str, session_state: dict):
@@ -94,9 +222,10 @@ class StateManager:
             self.save(state)
 
     def clear(self):
-        """Clear all state (delete the file)."""
-        if self.state_file.exists():
-            self.state_file.unlink()
+        """Clear all state (delete the file and its transaction lockfile)."""
+        self.state_file.unlink(missing_ok=True)
+        self._lock_file.unlink(missing_ok=True)
+        self._txn.pending = None
 
     def exists(self) -> bool:
         """
@@ -133,6 +262,26 @@ class StateManager:
         session_state = self.get_session_state(session_id)
         return session_state.get("turn_count", 0)
 
+    def get_session_fields(self, session_id: str, *fields: str, default: Any = 0) -> tuple:
+        """
+        Get several fields of a session's state from a single load.
+
+        Args:
+            session_id: Session ID
+            *fields: Names of the fields to read
+            default: Value for fields that are not set
+
+        Returns:
+            Tuple of field values, in the order requested
+
+        Example:
+            last_line, turn_count = state_manager.get_session_fields(
+                session_id, "last_line", "turn_count"
+            )
+        """
+        session_state = self.load().get(session_id, {})
+        return tuple(session_state.get(field, default) for field in fields)
+
     def set_last_line(self, session_id: str, last_line: int):
         """
         Set the last processed line number for a session.
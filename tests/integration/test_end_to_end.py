@@ -30,151 +30,167 @@ from claude_trace.models import (
 )
 
 
-class TestEndToEndTracing:
-    """End-to-end tests for the complete tracing pipeline."""
-    
-    @pytest.fixture
-    def temp_db(self, tmp_path):
-        """Create a temporary database for testing."""
-        db_path = tmp_path / "test_traces.db"
-        return TraceStorage(str(db_path))
+@pytest.fixture(scope="class")
+def temp_db(tmp_path_factory):
+    """Create a temporary database shared by the tests in a class."""
+    db_path = tmp_path_factory.mktemp("e2e") / "test_traces.db"
+    storage = TraceStorage(str(db_path), ephemeral=True)
+    yield storage
+    storage.close()
+
+
+@pytest.fixture(scope="module")
+def complex_transcript(tmp_path_factory):
+    """
+    Create a complex transcript with multiple turns, tools, and cache usage.
     
-    @pytest.fixture
-    def complex_transcript(self, tmp_path):
-        """Create a complex transcript with multiple turns, tools, and cache usage."""
-        transcript_data = [
-            # Turn 1: User question with tool use
-            {
-                "type": "user",
-                "role": "user", 
-                "content": "Read the config file and explain what it does",
-                "timestamp": "2025-02-04T10:30:00.000000Z"
-            },
-            {
-                "type": "assistant",
-                "message": {
-                    "id": "msg_001",
-                    "role": "assistant",
-                    "model": "claude-sonnet-4-5-20250929",
-                    "content": [
-                        {"type": "text", "text": "I'll read the config file for you."},
-                        {"type": "tool_use", "id": "tool_001", "name": "Read", "input": {"file_path": "/config/settings.json"}}
-                    ],
-                    "usage": {
-                        "input_tokens": 150,
-                        "output_tokens": 45,
-                        "cache_read_input_tokens": 100,
-                        "cache_creation_input_tokens": 50
-                    }
-                },
-                "timestamp": "2025-02-04T10:30:02.500000Z"
+    Written once per module; tests only read it.
+    """
+    transcript_data = [
+        # Turn 1: User question with tool use
+        {
+            "type": "user",
+            "role": "user", 
+            "content": "Read the config file and explain what it does",
+            "timestamp": "2025-02-04T10:30:00.000000Z"
+        },
+        {
+            "type": "assistant",
+            "message": {
+                "id": "msg_001",
+                "role": "assistant",
+                "model": "claude-sonnet-4-5-20250929",
+                "content": [
+                    {"type": "text", "text": "I'll read the config file for you."},
+                    {"type": "tool_use", "id": "tool_001", "name": "Read", "input": {"file_path": "/config/settings.json"}}
+                ],
+                "usage": {
+                    "input_tokens": 150,
+                    "output_tokens": 45,
+                    "cache_read_input_tokens": 100,
+                    "cache_creation_input_tokens": 50
+                }
             },
-            {
-                "type": "user",
-                "role": "user",
-                "content": [{"type": "tool_result", "tool_use_id": "tool_001", "content": '{"debug": true, "port": 8080}'}],
-                "timestamp": "2025-02-04T10:30:02.600000Z"
-            },
-            {
-                "type": "assistant",
-                "message": {
-                    "id": "msg_002",
-                    "role": "assistant",
-                    "model": "claude-sonnet-4-5-20250929",
-                    "content": [
-                        {"type": "text", "text": "The config file contains debug mode enabled and port 8080."}
-                    ],
-                    "usage": {
-                        "input_tokens": 200,
-                        "output_tokens": 30,
-                        "cache_read_input_tokens": 150,
-                        "cache_creation_input_tokens": 0
-                    }
-                },
-                "timestamp": "2025-02-04T10:30:05.000000Z"
-            },
-            
-            # Turn 2: Follow-up with multiple tool calls
-            {
-                "type": "user",
-                "role": "user",
-                "content": "Now check if port 8080 is in use and show running processes",
-                "timestamp": "2025-02-04T10:30:10.000000Z"
-            },
-            {
-                "type": "assistant",
-                "message": {
-                    "id": "msg_003",
-                    "role": "assistant",
-                    "model": "claude-sonnet-4-5-20250929",
-                    "content": [
-                        {"type": "thinking", "thinking": "I need to check the port and list processes..."},
-                        {"type": "text", "text": "Let me check that for you."},
-                        {"type": "tool_use", "id": "tool_002", "name": "Bash", "input": {"command": "lsof -i :8080"}}
-                    ],
-                    "usage": {
-                        "input_tokens": 300,
-                        "output_tokens": 60,
-                        "cache_read_input_tokens": 200
-                    }
-                },
-                "timestamp": "2025-02-04T10:30:12.000000Z"
+            "timestamp": "2025-02-04T10:30:02.500000Z"
+        },
+        {
+            "type": "user",
+            "role": "user",
+            "content": [{"type": "tool_result", "tool_use_id": "tool_001", "content": '{"debug": true, "port": 8080}'}],
+            "timestamp": "2025-02-04T10:30:02.600000Z"
+        },
+        {
+            "type": "assistant",
+            "message": {
+                "id": "msg_002",
+                "role": "assistant",
+                "model": "claude-sonnet-4-5-20250929",
+                "content": [
+                    {"type": "text", "text": "The config file contains debug mode enabled and port 8080."}
+                ],
+                "usage": {
+                    "input_tokens": 200,
+                    "output_tokens": 30,
+                    "cache_read_input_tokens": 150,
+                    "cache_creation_input_tokens": 0
+                }
             },
-            {
-                "type": "user",
-                "role": "user",
-                "content": [{"type": "tool_result", "tool_use_id": "tool_002", "content": "node    1234  user   TCP *:8080 (LISTEN)"}],
-                "timestamp": "2025-02-04T10:30:13.500000Z"
+            "timestamp": "2025-02-04T10:30:05.000000Z"
+        },
+
+        # Turn 2: Follow-up with multiple tool calls
+        {
+            "type": "user",
+            "role": "user",
+            "content": "Now check if port 8080 is in use and show running processes",
+            "timestamp": "2025-02-04T10:30:10.000000Z"
+        },
+        {
+            "type": "assistant",
+            "message": {
+                "id": "msg_003",
+                "role": "assistant",
+                "model": "claude-sonnet-4-5-20250929",
+                "content": [
+                    {"type": "thinking", "thinking": "I need to check the port and list processes..."},
+                    {"type": "text", "text": "Let me check that for you."},
+                    {"type": "tool_use", "id": "tool_002", "name": "Bash", "input": {"command": "lsof -i :8080"}}
+                ],
+                "usage": {
+                    "input_tokens": 300,
+                    "output_tokens": 60,
+                    "cache_read_input_tokens": 200
+                }
             },
-            {
-                "type": "assistant",
-                "message": {
-                    "id": "msg_004",
-                    "role": "assistant",
-                    "model": "claude-sonnet-4-5-20250929",
-                    "content": [
-                        {"type": "text", "text": "Port 8080 is in use by a Node.js process (PID 1234)."}
-                    ],
-                    "usage": {
-                        "input_tokens": 350,
-                        "output_tokens": 25
-                    }
-                },
-                "timestamp": "2025-02-04T10:30:15.000000Z"
+            "timestamp": "2025-02-04T10:30:12.000000Z"
+        },
+        {
+            "type": "user",
+            "role": "user",
+            "content": [{"type": "tool_result", "tool_use_id": "tool_002", "content": "node    1234  user   TCP *:8080 (LISTEN)"}],
+            "timestamp": "2025-02-04T10:30:13.500000Z"
+        },
+        {
+            "type": "assistant",
+            "message": {
+                "id": "msg_004",
+                "role": "assistant",
+                "model": "claude-sonnet-4-5-20250929",
+                "content": [
+                    {"type": "text", "text": "Port 8080 is in use by a Node.js process (PID 1234)."}
+                ],
+                "usage": {
+                    "input_tokens": 350,
+                    "output_tokens": 25
+                }
             },
-            
-            # Turn 3: Simple question without tools
-            {
-                "type": "user",
-                "role": "user",
-                "content": "Should I stop that process?",
-                "timestamp": "2025-02-04T10:30:20.000000Z"
+            "timestamp": "2025-02-04T10:30:15.000000Z"
+        },
+
+        # Turn 3: Simple question without tools
+        {
+            "type": "user",
+            "role": "user",
+            "content": "Should I stop that process?",
+            "timestamp": "2025-02-04T10:30:20.000000Z"
+        },
+        {
+            "type": "assistant",
+            "message": {
+                "id": "msg_005",
+                "role": "assistant",
+                "model": "claude-sonnet-4-5-20250929",
+                "content": [
+                    {"type": "text", "text": "That depends on whether you need it. It appears to be your development server."}
+                ],
+                "usage": {
+                    "input_tokens": 400,
+                    "output_tokens": 35,
+                    "cache_read_input_tokens": 350
+                }
             },
-            {
-                "type": "assistant",
-                "message": {
-                    "id": "msg_005",
-                    "role": "assistant",
-                    "model": "claude-sonnet-4-5-20250929",
-                    "content": [
-                        {"type": "text", "text": "That depends on whether you need it. It appears to be your development server."}
-                    ],
-                    "usage": {
-                        "input_tokens": 400,
-                        "output_tokens": 35,
-                        "cache_read_input_tokens": 350
-                    }
-                },
-                "timestamp": "2025-02-04T10:30:22.000000Z"
-            }
-        ]
-        
-        transcript_path = tmp_path / "complex_session.jsonl"
-        with open(transcript_path, 'w') as f:
-            for item in transcript_data:
-                f.write(json.dumps(item) + '\n')
-        
-        return transcript_path
+            "timestamp": "2025-02-04T10:30:22.000000Z"
+        }
+    ]
+
+    transcript_path = tmp_path_factory.mktemp("data") / "complex_session.jsonl"
+    with open(transcript_path, 'w') as f:
+        for item in transcript_data:
+            f.write(json.dumps(item) + '\n')
+
+    return transcript_path
+
+
+class TestEndToEndTracing:
+    """End-to-end tests for the complete tracing pipeline."""
+    
+    @pytest.fixture(autouse=True)
+    def empty_db(self, temp_db):
+        """Remove every session a test stored, so the next one starts empty."""
+        yield
+        with temp_db._write_connection() as conn:
+            # Turns, messages and tool uses go with them via ON DELETE CASCADE
+            conn.execute("DELETE FROM sessions")
     
     def test_complete_pipeline_collection(self, temp_db, complex_transcript):
         """Test 1: Verify complete data collection from transcript."""
@@ -605,60 +621,67 @@ class TestEndToEndTracing:
         assert len(session.turns) == 1  # Valid data was processed
 
 
+@pytest.fixture(scope="module")
+def sample_session(tmp_path_factory):
+    """
+    Create a sample session for testing.
+    
+    Built once per module; tests only read the session and its storage.
+    """
+    tmp_path = tmp_path_factory.mktemp("plan")
+    db_path = tmp_path / "test.db"
+    storage = TraceStorage(str(db_path))
+    collector = TraceCollector(storage=storage)
+
+    # Create transcript
+    transcript_path = tmp_path / "session.jsonl"
+    with open(transcript_path, 'w') as f:
+        f.write(json.dumps({
+            "type": "user", "role": "user",
+            "content": "Test question",
+            "timestamp": "2025-02-04T10:00:00Z"
+        }) + '\n')
+        f.write(json.dumps({
+            "type": "assistant",
+            "message": {
+                "id": "msg_1", "role": "assistant",
+                "model": "claude-sonnet-4-5",
+                "content": [
+                    {"type": "text", "text": "Answer"},
+                    {"type": "tool_use", "id": "t1", "name": "Read", "input": {"path": "/test"}}
+                ],
+                "usage": {
+                    "input_tokens": 100,
+                    "output_tokens": 50,
+                    "cache_read_input_tokens": 80
+                }
+            },
+            "timestamp": "2025-02-04T10:00:02Z"
+        }) + '\n')
+        f.write(json.dumps({
+            "type": "user", "role": "user",
+            "content": [{"type": "tool_result", "tool_use_id": "t1", "content": "file contents"}],
+            "timestamp": "2025-02-04T10:00:03Z"
+        }) + '\n')
+        f.write(json.dumps({
+            "type": "assistant",
+            "message": {
+                "id": "msg_2", "role": "assistant",
+                "model": "claude-sonnet-4-5",
+                "content": [{"type": "text", "text": "Done!"}],
+                "usage": {"input_tokens": 120, "output_tokens": 10}
+            },
+            "timestamp": "2025-02-04T10:00:05Z"
+        }) + '\n')
+
+    session = collector.collect_from_file(str(transcript_path), session_id="req_test")
+    yield session, storage
+    storage.close()
+
+
 class TestPlanRequirements:
     """Tests specifically verifying each plan requirement is met."""
     
-    @pytest.fixture
-    def sample_session(self, tmp_path):
-        """Create a sample session for testing."""
-        db_path = tmp_path / "test.db"
-        storage = TraceStorage(str(db_path))
-        collector = TraceCollector(storage=storage)
-        
-        # Create transcript
-        transcript_path = tmp_path / "session.jsonl"
-        with open(transcript_path, 'w') as f:
-            f.write(json.dumps({
-                "type": "user", "role": "user",
-                "content": "Test question",
-                "timestamp": "2025-02-04T10:00:00Z"
-            }) + '\n')
-            f.write(json.dumps({
-                "type": "assistant",
-                "message": {
-                    "id": "msg_1", "role": "assistant",
-                    "model": "claude-sonnet-4-5",
-                    "content": [
-                        {"type": "text", "text": "Answer"},
-                        {"type": "tool_use", "id": "t1", "name": "Read", "input": {"path": "/test"}}
-                    ],
-                    "usage": {
-                        "input_tokens": 100,
-                        "output_tokens": 50,
-                        "cache_read_input_tokens": 80
-                    }
-                },
-                "timestamp": "2025-02-04T10:00:02Z"
-            }) + '\n')
-            f.write(json.dumps({
-                "type": "user", "role": "user",
-                "content": [{"type": "tool_result", "tool_use_id": "t1", "content": "file contents"}],
-                "timestamp": "2025-02-04T10:00:03Z"
-            }) + '\n')
-            f.write(json.dumps({
-                "type": "assistant",
-                "message": {
-                    "id": "msg_2", "role": "assistant",
-                    "model": "claude-sonnet-4-5",
-                    "content": [{"type": "text", "text": "Done!"}],
-                    "usage": {"input_tokens": 120, "output_tokens": 10}
-                },
-                "timestamp": "2025-02-04T10:00:05Z"
-            }) + '\n')
-        
-        session = collector.collect_from_file(str(transcript_path), session_id="req_test")
-        return session, storage
-    
     def test_requirement_1_session_timeline(self, sample_session):
         """Requirement 1: Main process flow visualization for each session."""
         session, storage = sample_session
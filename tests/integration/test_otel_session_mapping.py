@@ -39,7 +39,9 @@ class TestOtelSessionMappingIntegration:
     def temp_db(self, tmp_path):
         """Create a temporary database for testing."""
         db_path = tmp_path / "test_traces.db"
-        return TraceStorage(str(db_path))
+        storage = TraceStorage(str(db_path))
+        yield storage
+        storage.close()
     
     @pytest.fixture
     def sample_otel_output(self):
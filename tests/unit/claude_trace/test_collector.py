@@ -100,6 +100,20 @@ class TestTraceCollector:
         
         assert len(session.turns) == 0
     
+    def test_collect_skips_malformed_lines(self, temp_transcript, minimal_transcript_data):
+        """Test that malformed lines are skipped and non-ASCII text survives."""
+        minimal_transcript_data[0]["content"] = "Héllo → 世界"
+        with open(temp_transcript, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(minimal_transcript_data[0], ensure_ascii=False) + '\n')
+            f.write('{not json\n')
+            f.write(json.dumps(minimal_transcript_data[1]) + '\n')
+        
+        collector = TraceCollector()
+        session = collector.collect_from_file(str(temp_transcript))
+        
+        assert len(session.turns) == 1
+        assert session.turns[0].user_message.text_content == "Héllo → 世界"
+    
     def test_collect_file_not_found(self, tmp_path):
         """Test error when file not found."""
         collector = TraceCollector()
@@ -218,3 +232,39 @@ class TestIncrementalCollection:
         )
         
         assert last_line2 == last_line1
+    
+    def test_incremental_resumes_after_append(self, temp_transcript, minimal_transcript_data):
+        """Test that a follow-up call reads only lines appended since the last one."""
+        write_transcript(temp_transcript, minimal_transcript_data)
+        collector = TraceCollector()
+        _, last_line = collector.collect_incremental(str(temp_transcript), "s", 0)
+        
+        assert collector._line_offsets[str(temp_transcript)] == (2, temp_transcript.stat().st_size)
+        
+        follow_up = [dict(m) for m in minimal_transcript_data]
+        follow_up[0]["content"] = "Again"
+        with open(temp_transcript, 'a') as f:
+            for item in follow_up:
+                f.write(json.dumps(item) + '\n')
+        
+        session, last_line = collector.collect_incremental(str(temp_transcript), "s", last_line)
+        
+        assert last_line == 4
+        assert [t.user_message.text_content for t in session.turns] == ["Again"]
+    
+    def test_incremental_rescans_rewritten_file(self, temp_transcript, minimal_transcript_data):
+        """Test that a saved offset is not used once the file no longer matches it."""
+        write_transcript(temp_transcript, minimal_transcript_data * 2)
+        collector = TraceCollector()
+        _, last_line = collector.collect_incremental(str(temp_transcript), "s", 0)
+        
+        # Rewritten with longer lines, so the old offset falls mid-line
+        rewritten = [dict(m) for m in minimal_transcript_data]
+        rewritten[0]["content"] = "Hello, with a much longer question"
+        write_transcript(temp_transcript, rewritten * 3)
+        session, last_line = collector.collect_incremental(str(temp_transcript), "s", 4)
+        
+        assert last_line == 6
+        assert [t.user_message.text_content for t in session.turns] == [
+            "Hello, with a much longer question"
+        ]
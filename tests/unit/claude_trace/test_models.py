@@ -108,6 +108,26 @@ class TestContentBlock:
         assert block.type == ContentType.TOOL_RESULT
         assert block.tool_use_id == "tool_123"
         assert block.tool_result == "File contents here"
+    
+    def test_from_dict_unknown_type(self):
+        """Test that unknown block types become text blocks."""
+        data = {"type": "image", "source": {}}
+        block = ContentBlock.from_dict(data)
+        assert block.type == ContentType.TEXT
+        assert block.text == str(data)
+    
+    def test_from_dicts(self):
+        """Test creating several content blocks at once."""
+        items = [
+            {"type": "text", "text": "Hello"},
+            {"type": "tool_use", "id": "tool_1", "name": "Bash", "input": {}},
+            {"type": "image"},
+        ]
+        blocks = ContentBlock.from_dicts(items)
+        assert blocks == [ContentBlock.from_dict(item) for item in items]
+        assert [b.type for b in blocks] == [
+            ContentType.TEXT, ContentType.TOOL_USE, ContentType.TEXT
+        ]
 
 
 @pytest.mark.unit
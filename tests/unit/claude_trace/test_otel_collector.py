@@ -427,7 +427,9 @@ class TestOtelIntegrationWithStorage:
     def temp_db(self, tmp_path):
         from claude_trace.storage import TraceStorage
         db_path = tmp_path / "test.db"
-        return TraceStorage(str(db_path))
+        storage = TraceStorage(str(db_path))
+        yield storage
+        storage.close()
     
     def test_save_otel_to_storage(self, temp_db):
         """Test saving OTEL metrics to storage."""
@@ -0,0 +1,1127 @@
+"""Tests for claude_trace.storage module."""
+
+import copy
+import gc
+import sqlite3
+import weakref
+import pytest
+from datetime import datetime, timedelta
+
+from claude_trace.models import (
+    ContentBlock,
+    ContentType,
+    Message,
+    MessageRole,
+    Session,
+    TokenUsage,
+    ToolUse,
+    Turn,
+)
+from claude_trace import storage as storage_module
+from claude_trace.storage import SCHEMA_VERSION, TraceStorage
+
+
+# Schema written by the first release, before PRAGMA user_version was used
+LEGACY_SCHEMA = """
+    CREATE TABLE sessions (
+        session_id TEXT PRIMARY KEY,
+        start_time TEXT NOT NULL,
+        end_time TEXT,
+        total_duration_ms INTEGER,
+        metadata TEXT
+    );
+    CREATE TABLE turns (
+        turn_id TEXT PRIMARY KEY,
+        session_id TEXT NOT NULL,
+        turn_number INTEGER NOT NULL,
+        start_time TEXT NOT NULL,
+        end_time TEXT,
+        duration_ms INTEGER,
+        FOREIGN KEY (session_id) REFERENCES sessions(session_id)
+    );
+    CREATE TABLE messages (
+        message_id TEXT PRIMARY KEY,
+        turn_id TEXT NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT,
+        model TEXT,
+        timestamp TEXT NOT NULL,
+        input_tokens INTEGER,
+        output_tokens INTEGER,
+        cache_read_tokens INTEGER,
+        cache_creation_tokens INTEGER,
+        raw_data TEXT,
+        FOREIGN KEY (turn_id) REFERENCES turns(turn_id)
+    );
+    CREATE TABLE tool_uses (
+        tool_id TEXT PRIMARY KEY,
+        turn_id TEXT NOT NULL,
+        message_id TEXT,
+        tool_name TEXT NOT NULL,
+        input_data TEXT,
+        output_data TEXT,
+        start_time TEXT NOT NULL,
+        end_time TEXT,
+        duration_ms INTEGER,
+        success INTEGER DEFAULT 1,
+        error TEXT,
+        FOREIGN KEY (turn_id) REFERENCES turns(turn_id),
+        FOREIGN KEY (message_id) REFERENCES messages(message_id)
+    );
+    CREATE INDEX idx_tool_uses_name ON tool_uses(tool_name);
+"""
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    """Create a database in the pre-versioning layout with one session."""
+    db_path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(str(db_path))
+    conn.executescript(LEGACY_SCHEMA + """
+        INSERT INTO sessions VALUES
+            ('legacy', '2025-02-04T10:30:00.500000', NULL, NULL, NULL);
+        INSERT INTO turns VALUES
+            ('turn_1', 'legacy', 1, '', NULL, NULL);
+        INSERT INTO messages VALUES
+            ('user_1', 'turn_1', 'user', '[]', NULL,
+             '2025-02-04T10:30:00.500000', 0, 0, 0, 0, NULL),
+            ('msg_1', 'turn_1', 'assistant', '[]', 'claude-sonnet-4-5',
+             '2025-02-04T10:30:01.000000', 10, 5, 0, 0, NULL);
+        INSERT INTO tool_uses VALUES
+            ('tool_1', 'turn_1', NULL, 'Bash', '{"command": "ls"}', 'ok',
+             '2025-02-04T10:30:01.000000', '2025-02-04T10:30:02.000000',
+             1000, 1, NULL);
+    """)
+    conn.close()
+    return db_path
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """Create a TraceStorage backed by a temporary database."""
+    storage = TraceStorage(str(tmp_path / "traces.db"))
+    yield storage
+    storage.close()
+
+
+@pytest.fixture
+def sample_session():
+    """Build a small session with one turn and one tool use."""
+    start = datetime(2025, 2, 4, 10, 30, 0, 123456)
+    user_message = Message(
+        message_id="user_1",
+        role=MessageRole.USER,
+        content=[ContentBlock(type=ContentType.TEXT, text="Read the file")],
+        timestamp=start,
+    )
+    assistant_message = Message(
+        message_id="msg_1",
+        role=MessageRole.ASSISTANT,
+        content=[ContentBlock(type=ContentType.TEXT, text="Reading it now")],
+        timestamp=datetime(2025, 2, 4, 10, 30, 2, 500000),
+        model="claude-sonnet-4-5",
+        usage=TokenUsage(input_tokens=100, output_tokens=50),
+    )
+    tool = ToolUse(
+        tool_id="tool_1",
+        tool_name="Read",
+        input_data={"file_path": "/tmp/file.txt"},
+        output_data="contents",
+        start_time=datetime(2025, 2, 4, 10, 30, 2, 500000),
+        end_time=datetime(2025, 2, 4, 10, 30, 3, 0),
+    )
+    turn = Turn(
+        turn_id="turn_1",
+        turn_number=1,
+        user_message=user_message,
+        assistant_messages=[assistant_message],
+        tool_uses=[tool],
+        start_time=start,
+        end_time=datetime(2025, 2, 4, 10, 30, 5, 0),
+    )
+    return Session(
+        session_id="session_1",
+        start_time=start,
+        end_time=turn.end_time,
+        turns=[turn],
+    )
+
+
+@pytest.mark.unit
+class TestTimestampStorage:
+    """Tests for epoch-microsecond timestamp columns."""
+
+    def test_round_trip_preserves_microseconds(self, storage, sample_session):
+        """Test that timestamps survive a save/load round trip exactly."""
+        storage.save_session(sample_session)
+
+        loaded = storage.get_session("session_1")
+
+        assert loaded.start_time == sample_session.start_time
+        assert loaded.end_time == sample_session.end_time
+        turn = loaded.turns[0]
+        assert turn.start_time == sample_session.turns[0].start_time
+        assert turn.user_message.timestamp == sample_session.turns[0].user_message.timestamp
+        assert turn.tool_uses[0].end_time == sample_session.turns[0].tool_uses[0].end_time
+
+    def test_timestamps_stored_as_integers(self, storage, sample_session):
+        """Test that timestamp columns hold INTEGER values."""
+        storage.save_session(sample_session)
+
+        conn = sqlite3.connect(storage.db_path)
+        try:
+            row = conn.execute(
+                "SELECT typeof(start_time), typeof(end_time) FROM sessions"
+            ).fetchone()
+        finally:
+            conn.close()
+
+        assert row == ("integer", "integer")
+
+    def test_otel_timestamps_round_trip_as_saved(self, storage):
+        """Test that OTEL data point timestamps come back exactly as saved."""
+        # In time order; the offset one is 10:00 UTC
+        timestamps = [
+            "2025-02-04T15:00:00+05:00",
+            "2025-02-04T10:30:01.123456",
+            "2025-02-04T10:30:02.123Z",
+        ]
+        storage.save_otel_metrics("session_1", {"metrics": {"tokens": {
+            "data_points": [
+                {"value": 1, "timestamp": ts} for ts in reversed(timestamps)
+            ],
+        }}})
+
+        points = storage.get_otel_metrics("session_1")
+
+        assert [p["timestamp"] for p in points] == timestamps
+
+    def test_otel_timestamps_saved_before_v12_use_epoch(self, storage):
+        """Test that rows without timestamp text fall back to the epoch value."""
+        storage.save_otel_metrics("session_1", {"metrics": {"tokens": {
+            "data_points": [{"value": 1, "timestamp": "2025-02-04T10:30:00Z"}],
+        }}})
+        storage.close()
+        conn = sqlite3.connect(storage.db_path)
+        try:
+            conn.executescript("""
+                ALTER TABLE otel_metrics DROP COLUMN timestamp_text;
+                PRAGMA user_version = 11;
+            """)
+        finally:
+            conn.close()
+
+        migrated = TraceStorage(storage.db_path)
+        points = migrated.get_otel_metrics("session_1")
+        migrated.close()
+
+        assert points[0]["timestamp"] == "2025-02-04T10:30:00"
+
+    def test_list_sessions_returns_iso_strings(self, storage, sample_session):
+        """Test that list_sessions keeps returning ISO 8601 strings."""
+        storage.save_session(sample_session)
+
+        sessions = storage.list_sessions()
+
+        assert sessions[0]["start_time"] == "2025-02-04T10:30:00.123456"
+
+    def test_list_sessions_since_filter(self, storage, sample_session):
+        """Test filtering sessions by start time."""
+        storage.save_session(sample_session)
+
+        assert len(storage.list_sessions(since=datetime(2025, 2, 4))) == 1
+        assert storage.list_sessions(since=datetime(2025, 2, 5)) == []
+
+
+@pytest.mark.unit
+class TestSchemaMigration:
+    """Tests for upgrading databases created by older versions."""
+
+    def test_new_database_has_current_version(self, storage):
+        """Test that a fresh database is stamped with SCHEMA_VERSION."""
+        conn = sqlite3.connect(storage.db_path)
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            conn.close()
+
+        assert version == SCHEMA_VERSION
+
+    def test_migrates_iso_text_timestamps(self, legacy_db):
+        """Test that a legacy database with TEXT timestamps is upgraded."""
+        storage = TraceStorage(str(legacy_db))
+        session = storage.get_session("legacy")
+
+        assert session.start_time == datetime(2025, 2, 4, 10, 30, 0, 500000)
+        assert session.end_time is None
+        assert session.turns[0].start_time is None
+        assert session.turns[0].tool_uses[0].end_time == datetime(2025, 2, 4, 10, 30, 2)
+
+    def test_migrates_names_into_lookup_tables(self, legacy_db):
+        """Test that model and tool names move into lookup tables."""
+        storage = TraceStorage(str(legacy_db))
+        session = storage.get_session("legacy")
+
+        assert session.turns[0].assistant_messages[0].model == "claude-sonnet-4-5"
+        assert session.turns[0].user_message.model is None
+        assert session.turns[0].tool_uses[0].tool_name == "Bash"
+        assert storage.get_tool_stats()["Bash"].total_duration_ms == 1000
+
+    def test_failed_migration_rolls_back(self, legacy_db, monkeypatch):
+        """Test that an error part-way through leaves the old schema intact."""
+        def fail(cursor):
+            raise RuntimeError("migration failed")
+        monkeypatch.setitem(storage_module._MIGRATIONS, SCHEMA_VERSION, fail)
+
+        with pytest.raises(RuntimeError):
+            TraceStorage(str(legacy_db))
+
+        conn = sqlite3.connect(str(legacy_db))
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            start_time = conn.execute(
+                "SELECT start_time FROM sessions"
+            ).fetchone()[0]
+        finally:
+            conn.close()
+        assert version == 0
+        assert start_time == "2025-02-04T10:30:00.500000"
+
+    def test_backfills_tool_use_session_id(self, legacy_db):
+        """Test that tool uses gain the session_id of their turn."""
+        storage = TraceStorage(str(legacy_db))
+
+        assert storage.get_tool_stats("legacy")["Bash"].call_count == 1
+        assert storage.list_sessions()[0]["tool_count"] == 1
+
+    def test_backfills_session_token_totals(self, legacy_db):
+        """Test that sessions gain token totals summed from their messages."""
+        storage = TraceStorage(str(legacy_db))
+
+        usage = storage.get_aggregate_token_usage("legacy")
+
+        assert usage.input_tokens == 10
+        assert usage.output_tokens == 5
+
+
+    def test_backfills_otel_global_totals(self, storage):
+        """Test that upgrading to v11 sums existing OTEL session summaries."""
+        for session_id, tokens in (("a", 100), ("b", 50)):
+            storage.save_otel_metrics(session_id, {
+                "summary": {"input_tokens": tokens, "api_latency_ms": tokens},
+            })
+        storage.close()
+        conn = sqlite3.connect(storage.db_path)
+        try:
+            conn.executescript("""
+                DROP TABLE otel_global_totals;
+                PRAGMA user_version = 10;
+            """)
+        finally:
+            conn.close()
+
+        aggregate = TraceStorage(storage.db_path).get_aggregate_otel_metrics()
+
+        assert aggregate["input_tokens"] == 150
+        assert aggregate["api_latency_ms"] == 75
+        assert aggregate["session_count"] == 2
+
+@pytest.mark.unit
+class TestConnectionPragmas:
+    """Tests for per-database and per-connection SQLite settings."""
+
+    def test_database_uses_wal(self, storage):
+        """Test that the database is switched to write-ahead logging."""
+        conn = sqlite3.connect(storage.db_path)
+        try:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        finally:
+            conn.close()
+
+    def test_connection_pragmas(self, storage):
+        """Test that connections relax fsyncs and enlarge the page cache."""
+        conn = storage._get_connection()
+        try:
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+            assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2
+            assert conn.execute("PRAGMA cache_size").fetchone()[0] == -64000
+            assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+            assert conn.execute("PRAGMA analysis_limit").fetchone()[0] == 400
+            assert conn.execute("PRAGMA mmap_size").fetchone()[0] > 0
+        finally:
+            conn.close()
+
+    def test_ephemeral_storage_skips_durability(self, tmp_path, sample_session):
+        """Test that ephemeral storage turns off fsyncs and the on-disk journal."""
+        storage = TraceStorage(str(tmp_path / "traces.db"), ephemeral=True)
+        conn = storage._get_connection()
+        try:
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 0
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "memory"
+        finally:
+            conn.close()
+
+        storage.save_session(sample_session)
+        assert storage.get_session("session_1").turns[0].tool_uses[0].tool_name == "Read"
+        assert not (tmp_path / "traces.db-wal").exists()
+
+    def test_close_gathers_planner_statistics(self, storage, sample_session):
+        """Test that close() runs PRAGMA optimize on written tables."""
+        storage.save_session(sample_session)
+        storage.close()
+
+        conn = sqlite3.connect(storage.db_path)
+        try:
+            tables = {
+                row[0] for row in conn.execute("SELECT tbl FROM sqlite_stat1")
+            }
+        finally:
+            conn.close()
+        assert {"turns", "messages", "tool_uses"} <= tables
+
+
+@pytest.mark.unit
+class TestSharedConnection:
+    """Tests for the connections reused across storage calls."""
+
+    def test_connection_is_reused(self, storage, sample_session):
+        """Test that successive calls share one connection."""
+        storage.save_session(sample_session)
+        conn = storage._conn
+        assert storage.get_session("session_1") is not None
+        assert storage._conn is conn
+
+    def test_failed_write_is_rolled_back(self, storage, sample_session):
+        """Test that a failed save leaves no open transaction behind."""
+        storage.save_session(sample_session, first_save=True)
+        with pytest.raises(sqlite3.IntegrityError):
+            storage.save_session(sample_session, first_save=True)
+        assert not storage._conn.in_transaction
+
+        sample_session.metadata = {"retried": True}
+        storage.save_session(sample_session)
+        assert storage.get_session("session_1").metadata == {"retried": True}
+
+    def test_failed_otel_write_is_rolled_back(self, storage):
+        """Test that a failing data point discards the whole metrics save."""
+        with pytest.raises(sqlite3.Error):
+            storage.save_otel_metrics("session_1", {
+                "summary": {"input_tokens": 100},
+                "metrics": {"bad": {"data_points": [{"value": {"nested": 1}}]}},
+            })
+
+        assert storage.get_otel_summary("session_1") is None
+        assert not storage._conn.in_transaction
+
+    def test_close_reopens_on_next_call(self, storage, sample_session):
+        """Test that the storage stays usable after close()."""
+        storage.save_session(sample_session)
+        storage.close()
+        assert storage._conn is None
+        assert storage.get_session("session_1") is not None
+
+    def test_unclosed_storage_is_garbage_collected(self, tmp_path, sample_session):
+        """Test that a storage never closed doesn't outlive its last reference."""
+        storage = TraceStorage(str(tmp_path / "traces.db"))
+        storage.save_session(sample_session)
+        ref = weakref.ref(storage)
+        del storage
+        gc.collect()
+        assert ref() is None
+
+    def test_reads_use_read_only_connections(self, storage, sample_session):
+        """Test that pooled read connections cannot write."""
+        storage.save_session(sample_session)
+        assert storage.get_session("session_1") is not None
+
+        with storage._read_connection() as conn:
+            with pytest.raises(sqlite3.OperationalError, match="readonly"):
+                conn.execute("DELETE FROM sessions")
+        assert storage.get_session("session_1") is not None
+
+    def test_read_pool_reuses_connections(self, storage):
+        """Test that idle read connections are returned to the pool."""
+        with storage._read_connection() as first:
+            pass
+        with storage._read_connection() as second:
+            assert second is first
+
+        storage.close()
+        assert not storage._readers
+
+    def test_iter_otel_metrics_streams_in_batches(self, storage):
+        """Test that an abandoned metrics iterator releases its connection."""
+        storage.save_otel_metrics("session_1", {"metrics": {"tokens": {
+            "data_points": [{"value": i} for i in range(5)],
+        }}})
+
+        points = storage.iter_otel_metrics("session_1", batch_size=2)
+        assert next(points)["metric_value"] == 0.0
+        assert not storage._readers
+        points.close()
+
+        assert len(storage._readers) == 1
+        assert [
+            p["metric_value"]
+            for p in storage.iter_otel_metrics("session_1", batch_size=2)
+        ] == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+    def test_read_only_uri_escapes_path(self, tmp_path, sample_session):
+        """Test that read connections open paths with URI special characters."""
+        storage = TraceStorage(str(tmp_path / "my traces #1?.db"))
+        storage.save_session(sample_session)
+
+        assert storage.get_session("session_1") is not None
+
+
+@pytest.mark.unit
+class TestLookupTables:
+    """Tests for the models/tool_names dictionary tables."""
+
+    def test_names_stored_once(self, storage, sample_session):
+        """Test that repeated names share a single lookup row."""
+        storage.save_session(sample_session)
+        sample_session.session_id = "session_2"
+        for turn in sample_session.turns:
+            turn.turn_id += "_2"
+        storage.save_session(sample_session)
+
+        conn = sqlite3.connect(storage.db_path)
+        try:
+            tool_names = conn.execute("SELECT name FROM tool_names").fetchall()
+            models = conn.execute("SELECT name FROM models").fetchall()
+        finally:
+            conn.close()
+
+        assert tool_names == [("Read",)]
+        assert models == [("claude-sonnet-4-5",)]
+
+    def test_metric_definitions_stored_once(self, storage):
+        """Test that OTEL unit/description live in one row per metric."""
+        metric = {
+            "type": "counter",
+            "unit": "tokens",
+            "description": "Number of tokens used",
+            "data_points": [{"value": 10}, {"value": 5}],
+        }
+        storage.save_otel_metrics("session_1", {"metrics": {"tokens": metric}})
+        storage.save_otel_metrics("session_2", {"metrics": {"tokens": metric}})
+
+        conn = sqlite3.connect(storage.db_path)
+        try:
+            defs = conn.execute(
+                "SELECT metric_name, unit, description FROM otel_metric_defs"
+            ).fetchall()
+        finally:
+            conn.close()
+
+        assert defs == [("tokens", "tokens", "Number of tokens used")]
+        points = storage.get_otel_metrics("session_2")
+        assert [p["metric_value"] for p in points] == [10.0, 5.0]
+        assert points[0]["unit"] == "tokens"
+        assert points[0]["description"] == "Number of tokens used"
+
+    def test_otel_metric_attribute_extracted_in_sql(self, storage):
+        """Test that one attribute is read for each data point in time order."""
+        storage.save_otel_metrics("session_1", {"metrics": {"tokens": {
+            "data_points": [
+                {"value": 2, "timestamp": "2025-02-04T10:31:00Z",
+                 "attributes": {"model": "opus", "tags": ["a"]}},
+                {"value": 1, "timestamp": "2025-02-04T10:30:00Z",
+                 "attributes": {"model": "sonnet"}},
+                {"value": 3, "timestamp": "2025-02-04T10:32:00Z"},
+            ],
+        }}})
+
+        assert storage.get_otel_metric_attribute(
+            "session_1", "tokens", "$.model"
+        ) == ["sonnet", "opus", None]
+        assert storage.get_otel_metric_attribute(
+            "session_1", "tokens", "$.tags"
+        ) == [None, '["a"]', None]
+
+    def test_otel_aggregate_tracks_resaves_and_deletes(self, storage):
+        """Test that the trigger-maintained OTEL totals match a full scan."""
+        storage.save_otel_metrics("a", {"summary": {"input_tokens": 100, "errors": 1}})
+        storage.save_otel_metrics("b", {"summary": {"input_tokens": 50}})
+        storage.save_otel_metrics("a", {"summary": {"input_tokens": 300}})
+
+        aggregate = storage.get_aggregate_otel_metrics()
+        assert aggregate["input_tokens"] == 350
+        assert aggregate["errors"] == 0
+        assert aggregate["session_count"] == 2
+
+        with storage._write_transaction() as cursor:
+            cursor.execute("DELETE FROM otel_session_summary")
+        aggregate = storage.get_aggregate_otel_metrics()
+        assert aggregate["input_tokens"] == 0
+        assert aggregate["session_count"] == 0
+
+    def test_tool_stats_keyed_by_name(self, storage, sample_session):
+        """Test that get_tool_stats still reports tool names."""
+        storage.save_session(sample_session)
+
+        stats = storage.get_tool_stats("session_1")
+
+        assert list(stats) == ["Read"]
+        assert stats["Read"].call_count == 1
+        assert stats["Read"].total_duration_ms == 500
+
+
+@pytest.mark.unit
+class TestQueryPlans:
+    """Tests that summary queries are served from indexes."""
+
+    def test_tool_stats_uses_covering_index(self, storage, sample_session):
+        """Test that session tool stats need no JOIN through turns or temp B-tree."""
+        storage.save_session(sample_session)
+
+        conn = sqlite3.connect(storage.db_path)
+        try:
+            plan = conn.execute("""
+                EXPLAIN QUERY PLAN
+                SELECT tool_name_id, COUNT(*), SUM(duration_ms)
+                FROM tool_uses WHERE session_id = ?
+                GROUP BY tool_name_id
+            """, ("session_1",)).fetchall()
+        finally:
+            conn.close()
+
+        details = " ".join(row[-1] for row in plan)
+        assert "COVERING INDEX idx_tool_uses_session" in details
+        assert "TEMP B-TREE" not in details
+
+    @pytest.mark.parametrize("query", [
+        "SELECT SUM(input_tokens), SUM(output_tokens) FROM messages",
+        "SELECT SUM(m.input_tokens) FROM messages m "
+        "JOIN turns t ON m.turn_id = t.turn_id WHERE t.session_id = 'session_1'",
+    ])
+    def test_token_aggregates_use_covering_indexes(self, storage, query):
+        """Test that token aggregates never read full table rows."""
+        conn = sqlite3.connect(storage.db_path)
+        try:
+            plan = conn.execute("EXPLAIN QUERY PLAN " + query).fetchall()
+        finally:
+            conn.close()
+
+        assert all("COVERING INDEX" in row[-1] for row in plan)
+
+    def test_turns_load_in_index_order(self, storage):
+        """Test that a session's turns are read in order without sorting."""
+        conn = sqlite3.connect(storage.db_path)
+        try:
+            plan = conn.execute("""
+                EXPLAIN QUERY PLAN
+                SELECT turn_id, turn_number, start_time, end_time
+                FROM turns WHERE session_id = ?
+                ORDER BY turn_number
+            """, ("session_1",)).fetchall()
+        finally:
+            conn.close()
+
+        details = " ".join(row[-1] for row in plan)
+        assert "idx_turns_session" in details
+        assert "TEMP B-TREE" not in details
+
+    def test_otel_metrics_load_in_index_order(self, storage):
+        """Test that a session's OTEL data points are read without sorting."""
+        storage.save_otel_metrics("session_1", {
+            "metrics": {
+                name: {"data_points": [{"value": 1}] * 50}
+                for name in ("b.metric", "a.metric")
+            },
+        })
+        conn = storage._get_connection()
+        try:
+            conn.execute("ANALYZE")
+            plan = conn.execute("""
+                EXPLAIN QUERY PLAN
+                SELECT d.metric_name, m.metric_value, m.timestamp
+                FROM otel_metrics m
+                JOIN otel_metric_defs d ON m.metric_def_id = d.metric_def_id
+                WHERE m.session_id = ?
+                ORDER BY d.metric_name, m.timestamp
+            """, ("session_1",)).fetchall()
+        finally:
+            conn.close()
+
+        details = " ".join(row[-1] for row in plan)
+        assert "idx_otel_metrics_session" in details
+        assert "TEMP B-TREE" not in details
+        names = [m["metric_name"] for m in storage.get_otel_metrics("session_1")]
+        assert names == ["a.metric"] * 50 + ["b.metric"] * 50
+
+    def test_list_sessions_counts(self, storage, sample_session):
+        """Test turn and tool counts reported by list_sessions."""
+        storage.save_session(sample_session)
+
+        session = storage.list_sessions()[0]
+
+        assert session["turn_count"] == 1
+        assert session["tool_count"] == 1
+
+    def test_counts_follow_later_saves(self, storage, sample_session):
+        """Test that stored counters are refreshed when a session grows."""
+        storage.save_session(sample_session)
+        turn = sample_session.turns[0]
+        turn.tool_uses.append(ToolUse(
+            tool_id="tool_2", tool_name="Bash", input_data={"command": "ls"}
+        ))
+        storage.save_session(sample_session)
+
+        session = storage.list_sessions()[0]
+
+        assert session["turn_count"] == 1
+        assert session["tool_count"] == 2
+
+    def test_token_totals_follow_later_saves(self, storage, sample_session):
+        """Test that stored token totals are refreshed when a session grows."""
+        storage.save_session(sample_session)
+        turn = sample_session.turns[0]
+        turn.assistant_messages.append(Message(
+            message_id="msg_2",
+            role=MessageRole.ASSISTANT,
+            content=[],
+            timestamp=turn.end_time,
+            usage=TokenUsage(input_tokens=7, output_tokens=3),
+        ))
+        storage.save_session(sample_session)
+
+        usage = storage.get_aggregate_token_usage("session_1")
+
+        assert usage.input_tokens == 107
+        assert usage.output_tokens == 53
+        assert storage.get_aggregate_token_usage().input_tokens == 107
+        assert storage.get_aggregate_token_usage("missing").input_tokens == 0
+
+
+@pytest.mark.unit
+class TestSaveSession:
+    """Tests for INSERT/UPSERT write paths."""
+
+    def test_first_save_round_trip(self, storage, sample_session):
+        """Test that a first save with plain INSERTs stores everything."""
+        storage.save_session(sample_session, first_save=True)
+
+        loaded = storage.get_session("session_1")
+
+        assert loaded.turns[0].tool_uses[0].tool_name == "Read"
+        assert loaded.turns[0].assistant_messages[0].model == "claude-sonnet-4-5"
+
+    def test_first_save_rejects_existing_rows(self, storage, sample_session):
+        """Test that first_save does not silently overwrite stored rows."""
+        storage.save_session(sample_session)
+
+        with pytest.raises(sqlite3.IntegrityError):
+            storage.save_session(sample_session, first_save=True)
+
+    def test_save_sessions_batch(self, storage, sample_session):
+        """Test saving several sessions with one call."""
+        other = Session(session_id="session_2", start_time=sample_session.start_time)
+
+        storage.save_sessions([sample_session, other], first_save=True)
+
+        ids = {s["session_id"] for s in storage.list_sessions()}
+        assert ids == {"session_1", "session_2"}
+
+    def test_save_sessions_is_atomic(self, storage, sample_session):
+        """Test that a failing session rolls back the whole batch."""
+        storage.save_session(sample_session)
+        other = Session(session_id="session_2", start_time=sample_session.start_time)
+
+        with pytest.raises(sqlite3.IntegrityError):
+            storage.save_sessions([other, sample_session], first_save=True)
+
+        assert storage.get_session("session_2") is None
+
+    def test_resave_updates_rows_in_place(self, storage, sample_session):
+        """Test that re-saving updates existing rows instead of replacing them."""
+        query = "SELECT rowid, message_id FROM messages ORDER BY message_id"
+        storage.save_session(sample_session)
+        conn = sqlite3.connect(storage.db_path)
+        try:
+            before = conn.execute(query).fetchall()
+        finally:
+            conn.close()
+
+        sample_session.turns[0].user_message.content[0].text = "Edited"
+        storage.save_session(sample_session)
+
+        conn = sqlite3.connect(storage.db_path)
+        try:
+            after = conn.execute(query).fetchall()
+        finally:
+            conn.close()
+        assert after == before
+        loaded = storage.get_session("session_1")
+        assert loaded.turns[0].user_message.text_content == "Edited"
+
+
+    def test_bulk_context_commits_once(self, storage, sample_session):
+        """Test that saves in a bulk block become visible together at the end."""
+        other = Session(session_id="session_2", start_time=sample_session.start_time)
+
+        with storage.bulk_context():
+            storage.save_session(sample_session)
+            storage.save_session(other)
+            assert storage.get_session("session_1") is None
+
+        ids = {s["session_id"] for s in storage.list_sessions()}
+        assert ids == {"session_1", "session_2"}
+
+    def test_bulk_context_rolls_back_on_error(self, storage, sample_session):
+        """Test that an error escaping the block discards all of its saves."""
+        with pytest.raises(RuntimeError):
+            with storage.bulk_context():
+                storage.save_session(sample_session)
+                raise RuntimeError("boom")
+
+        assert storage.get_session("session_1") is None
+
+    def test_bulk_context_keeps_saves_before_failed_one(self, storage, sample_session):
+        """Test that a failing save inside the block only undoes itself."""
+        storage.save_session(sample_session)
+        other = Session(session_id="session_2", start_time=sample_session.start_time)
+
+        with storage.bulk_context():
+            storage.save_session(other)
+            with pytest.raises(sqlite3.IntegrityError):
+                storage.save_session(sample_session, first_save=True)
+
+        assert storage.get_session("session_2") is not None
+
+
+@pytest.mark.unit
+class TestDeleteSession:
+    """Tests for cascading session deletes."""
+
+    def _count_rows(self, storage):
+        """Count rows left in the session-owned tables."""
+        conn = sqlite3.connect(storage.db_path)
+        try:
+            return [
+                conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("sessions", "turns", "messages", "tool_uses")
+            ]
+        finally:
+            conn.close()
+
+    def test_delete_cascades(self, storage, sample_session):
+        """Test that deleting a session removes its turns, messages and tools."""
+        storage.save_session(sample_session)
+
+        assert storage.delete_session("session_1") is True
+
+        assert self._count_rows(storage) == [0, 0, 0, 0]
+        assert storage.get_session("session_1") is None
+
+    def test_delete_missing_session(self, storage):
+        """Test deleting a session that does not exist."""
+        assert storage.delete_session("missing") is False
+
+    def test_delete_cascades_after_migration(self, legacy_db):
+        """Test that migrated databases also cascade deletes."""
+        storage = TraceStorage(str(legacy_db))
+
+        assert storage.delete_session("legacy") is True
+
+        assert self._count_rows(storage) == [0, 0, 0, 0]
+
+
+@pytest.mark.unit
+class TestToolStatsPercentiles:
+    """Tests for latency distribution fields in get_tool_stats."""
+
+    def test_duration_distribution(self, storage, sample_session):
+        """Test min/max/p50/p95 computed over stored durations."""
+        turn = sample_session.turns[0]
+        base = datetime(2025, 2, 4, 10, 31, 0)
+        for i, duration_ms in enumerate([100, 200, 300, 400]):
+            turn.tool_uses.append(ToolUse(
+                tool_id=f"bash_{i}",
+                tool_name="Bash",
+                input_data={},
+                start_time=base,
+                end_time=base + timedelta(milliseconds=duration_ms),
+            ))
+        turn.tool_uses.append(ToolUse(tool_id="bash_pending", tool_name="Bash", input_data={}))
+        storage.save_session(sample_session)
+
+        stats = storage.get_tool_stats("session_1")["Bash"]
+
+        assert stats.call_count == 5
+        assert stats.min_duration_ms == 100
+        assert stats.max_duration_ms == 400
+        assert stats.p50_duration_ms == pytest.approx(250.0)
+        assert stats.p95_duration_ms == pytest.approx(385.0)
+
+    def test_no_durations(self, storage, sample_session):
+        """Test that percentiles are None when no durations are known."""
+        sample_session.turns[0].tool_uses = [
+            ToolUse(tool_id="pending", tool_name="Bash", input_data={})
+        ]
+        storage.save_session(sample_session)
+
+        stats = storage.get_tool_stats()["Bash"]
+
+        assert stats.p50_duration_ms is None
+        assert stats.p95_duration_ms is None
+
+
+@pytest.mark.unit
+class TestExportParquet:
+    """Tests for the optional Parquet export."""
+
+    def test_export_round_trip(self, storage, tmp_path):
+        """Test that exported data points can be read back."""
+        pq = pytest.importorskip("pyarrow.parquet")
+        storage.save_otel_metrics("session_1", {
+            "metrics": {
+                "claude_code.token.usage": {
+                    "type": "counter",
+                    "unit": "tokens",
+                    "data_points": [
+                        {"value": 10, "attributes": {"type": "input"},
+                         "timestamp": "2025-02-04T10:30:00.000000"},
+                        {"value": 5, "attributes": {"type": "output"},
+                         "timestamp": "2025-02-04T10:30:01.000000"},
+                    ],
+                },
+            },
+        })
+        path = tmp_path / "metrics.parquet"
+
+        assert storage.export_parquet(str(path)) == 2
+
+        table = pq.read_table(str(path))
+        assert table.column("metric_value").to_pylist() == [10.0, 5.0]
+        assert table.column("timestamp").to_pylist()[1] == datetime(2025, 2, 4, 10, 30, 1)
+
+    def test_missing_pyarrow(self, storage, tmp_path):
+        """Test that a clear ImportError is raised without pyarrow."""
+        try:
+            import pyarrow  # noqa: F401
+            pytest.skip("pyarrow is installed")
+        except ImportError:
+            pass
+
+        with pytest.raises(ImportError, match="claude-trace\\[parquet\\]"):
+            storage.export_parquet(str(tmp_path / "metrics.parquet"))
+
+
+@pytest.mark.unit
+class TestPayloadCompression:
+    """Tests for compressed payload columns."""
+
+    def test_large_payloads_compressed(self, storage, sample_session):
+        """Test that large payloads are stored as BLOBs and round-trip."""
+        tool = sample_session.turns[0].tool_uses[0]
+        tool.output_data = "line of file content\n" * 200
+        storage.save_session(sample_session)
+
+        conn = sqlite3.connect(storage.db_path)
+        try:
+            stored = conn.execute(
+                "SELECT typeof(output_data), length(output_data), "
+                "typeof(input_data) FROM tool_uses"
+            ).fetchone()
+        finally:
+            conn.close()
+
+        assert stored[0] == "blob"
+        assert stored[1] < len(tool.output_data)
+        assert stored[2] == "text"
+        loaded = storage.get_session("session_1").turns[0].tool_uses[0]
+        assert loaded.output_data == tool.output_data
+        assert loaded.input_data == {"file_path": "/tmp/file.txt"}
+
+
+@pytest.mark.unit
+class TestBackgroundWrites:
+    """Tests for the opt-in background writer thread."""
+
+    @pytest.fixture
+    def background_storage(self, tmp_path):
+        """Create a TraceStorage that queues writes to a writer thread."""
+        storage = TraceStorage(str(tmp_path / "traces.db"), background_writes=True)
+        yield storage
+        storage.close()
+
+    def test_bulk_context_leaves_batching_to_writer(self, background_storage, sample_session):
+        """Test that a bulk block doesn't hold a transaction the writer waits on."""
+        with background_storage.bulk_context():
+            background_storage.save_session(sample_session)
+            assert background_storage.delete_session("session_1") is True
+
+        background_storage.flush()
+        assert background_storage.get_session("session_1") is None
+
+    def test_delete_after_queued_save(self, background_storage, sample_session):
+        """Test that deleting a session just saved removes it for good."""
+        background_storage.save_session(sample_session)
+
+        assert background_storage.delete_session("session_1") is True
+        background_storage.flush()
+        assert background_storage.get_session("session_1") is None
+
+    def test_writes_visible_after_flush(self, background_storage, sample_session):
+        """Test that queued writes are committed by flush()."""
+        background_storage.save_session(sample_session)
+        background_storage.save_otel_metrics("session_1", {
+            "summary": {"input_tokens": 100},
+            "metrics": {},
+        })
+
+        background_storage.flush()
+
+        assert background_storage.get_session("session_1") is not None
+        assert background_storage.get_otel_summary("session_1")["input_tokens"] == 100
+
+    def test_failed_write_does_not_discard_batch(
+        self, background_storage, sample_session
+    ):
+        """Test that one failing write is reported while the others commit."""
+        background_storage.save_session(sample_session)
+        background_storage.save_session(sample_session, first_save=True)
+        background_storage.save_otel_metrics("session_1", {"metrics": {}})
+
+        with pytest.raises(sqlite3.IntegrityError):
+            background_storage.flush()
+
+        assert background_storage.get_session("session_1") is not None
+        assert background_storage.has_otel_metrics("session_1")
+        background_storage.flush()
+
+    def test_queue_is_bounded(self, tmp_path, monkeypatch, sample_session):
+        """Test that save calls wait for room once the queue is full."""
+        monkeypatch.setattr(storage_module, "_WRITE_QUEUE_SIZE", 1)
+        storage = TraceStorage(str(tmp_path / "traces.db"), background_writes=True)
+        try:
+            for _ in range(5):
+                storage.save_session(sample_session)
+                assert storage._write_queue.qsize() <= 1
+            storage.flush()
+            assert storage.get_session("session_1") is not None
+        finally:
+            storage.close()
+
+    def test_close_flushes(self, tmp_path, sample_session):
+        """Test that close() commits writes still in the queue."""
+        storage = TraceStorage(str(tmp_path / "traces.db"), background_writes=True)
+        storage.save_session(sample_session)
+
+        storage.close()
+
+        assert TraceStorage(storage.db_path).get_session("session_1") is not None
+
+
+@pytest.mark.unit
+class TestContentEncoding:
+    """Tests for the stored content block encoding."""
+
+    def test_all_block_types_round_trip(self, storage, sample_session):
+        """Test that every content block type survives a save/load."""
+        blocks = [
+            ContentBlock(type=ContentType.THINKING, thinking="Plan"),
+            ContentBlock(type=ContentType.TEXT, text="Reading it now"),
+            ContentBlock(
+                type=ContentType.TOOL_USE,
+                tool_use_id="tool_1",
+                tool_name="Read",
+                tool_input={"file_path": "/tmp/file.txt"},
+            ),
+            ContentBlock(
+                type=ContentType.TOOL_RESULT,
+                tool_use_id="tool_1",
+                tool_result="contents",
+            ),
+        ]
+        sample_session.turns[0].assistant_messages[0].content = blocks
+        storage.save_session(sample_session)
+
+        loaded = storage.get_session("session_1")
+
+        assert loaded.turns[0].assistant_messages[0].content == blocks
+
+    def test_reads_legacy_encoding(self, legacy_db):
+        """Test that content stored with full field names still loads."""
+        conn = sqlite3.connect(str(legacy_db))
+        conn.execute("""
+            UPDATE messages SET content = '[{"type": "tool_use", "text": null,
+                "thinking": null, "tool_use_id": "tool_1", "tool_name": "Bash",
+                "tool_input": {"command": "ls"}, "tool_result": null}]'
+            WHERE message_id = 'msg_1'
+        """)
+        conn.commit()
+        conn.close()
+
+        session = TraceStorage(str(legacy_db)).get_session("legacy")
+
+        block = session.turns[0].assistant_messages[0].content[0]
+        assert block.type == ContentType.TOOL_USE
+        assert block.tool_name == "Bash"
+        assert block.tool_input == {"command": "ls"}
+
+
+@pytest.mark.unit
+class TestLazyMessagePayloads:
+    """Tests for message content and raw_data decoded on first access."""
+
+    def test_loaded_message_equals_saved(self, storage, sample_session):
+        """Test that a loaded message compares equal to the one saved."""
+        original = sample_session.turns[0].assistant_messages[0]
+        original.raw_data = {"type": "assistant", "message": {"id": "msg_1"}}
+        storage.save_session(sample_session)
+
+        loaded = storage.get_session("session_1").turns[0].assistant_messages[0]
+
+        assert loaded == original
+        assert original == loaded
+        assert loaded.raw_data == {"type": "assistant", "message": {"id": "msg_1"}}
+
+    def test_payloads_not_decoded_until_accessed(self, storage, sample_session):
+        """Test that loading a session leaves payloads encoded."""
+        storage.save_session(sample_session)
+
+        loaded = storage.get_session("session_1").turns[0].assistant_messages[0]
+
+        assert loaded._content is storage_module._PENDING
+        assert loaded.text_content == "Reading it now"
+        assert loaded._content is not storage_module._PENDING
+
+    def test_resave_keeps_untouched_payloads(self, storage, sample_session):
+        """Test that re-saving a loaded session writes stored values back."""
+        message = sample_session.turns[0].assistant_messages[0]
+        message.raw_data = {"payload": "x" * 2000}
+        storage.save_session(sample_session)
+
+        storage.save_session(storage.get_session("session_1"))
+        loaded = storage.get_session("session_1").turns[0].assistant_messages[0]
+
+        assert loaded.raw_data == {"payload": "x" * 2000}
+        assert loaded.text_content == "Reading it now"
+
+    def test_resave_writes_modified_content(self, storage, sample_session):
+        """Test that content changed after loading is saved."""
+        storage.save_session(sample_session)
+        session = storage.get_session("session_1")
+        message = session.turns[0].assistant_messages[0]
+        message.content.append(ContentBlock(type=ContentType.TEXT, text="Done"))
+        message.raw_data = {"edited": True}
+
+        storage.save_session(session)
+        loaded = storage.get_session("session_1").turns[0].assistant_messages[0]
+
+        assert loaded.text_content == "Reading it now\nDone"
+        assert loaded.raw_data == {"edited": True}
+
+    def test_copy_is_plain_message(self, storage, sample_session):
+        """Test that copying a loaded message yields a decoded Message."""
+        storage.save_session(sample_session)
+        loaded = storage.get_session("session_1").turns[0].assistant_messages[0]
+
+        copied = copy.deepcopy(loaded)
+
+        assert type(copied) is Message
+        assert copied == loaded
+
@@ -1,10 +1,15 @@
 """Tests for claude_trace.utils module."""
 
+import json
+import uuid
 import pytest
-from datetime import datetime
+from datetime import date, datetime, timedelta, timezone
 
+from claude_trace import utils as utils_module
 from claude_trace.utils import (
     parse_timestamp,
+    to_epoch_us,
+    from_epoch_us,
     format_duration,
     format_tokens,
     format_percentage,
@@ -12,8 +17,11 @@ from claude_trace.utils import (
     truncate_string,
     clean_model_name,
     generate_id,
+    json_dumps,
+    json_loads,
     safe_json_loads,
     get_nested,
+    make_getter,
 )
 
 
@@ -46,6 +54,46 @@ class TestParseTimestamp:
         """Test parsing empty string returns current time."""
         result = parse_timestamp("")
         assert isinstance(result, datetime)
+    
+    def test_date_only_is_rejected(self):
+        """Test that a string without a time part isn't read as midnight."""
+        before = datetime.now()
+        result = parse_timestamp("2025-02-04")
+        assert result >= before
+    
+    def test_offset_keeps_wall_clock_time(self):
+        """Test that a UTC offset is dropped rather than applied."""
+        result = parse_timestamp("2025-02-04T10:30:00+05:00")
+        assert result == datetime(2025, 2, 4, 10, 30)
+    
+    def test_repeated_timestamp_reuses_result(self):
+        """Test that parsing the same string twice hits the cache."""
+        first = parse_timestamp("2025-02-04T10:30:00.5Z")
+        assert parse_timestamp("2025-02-04T10:30:00.5Z") is first
+
+
+@pytest.mark.unit
+class TestEpochMicroseconds:
+    """Tests for to_epoch_us and from_epoch_us functions."""
+    
+    def test_epoch_is_zero(self):
+        """Test that the Unix epoch converts to zero."""
+        assert to_epoch_us(datetime(1970, 1, 1)) == 0
+    
+    def test_round_trip(self):
+        """Test that conversion round-trips exactly."""
+        dt = datetime(2025, 2, 4, 10, 30, 0, 123456)
+        assert from_epoch_us(to_epoch_us(dt)) == dt
+    
+    def test_aware_datetime_normalized_to_utc(self):
+        """Test that aware datetimes are converted to UTC first."""
+        aware = datetime(2025, 2, 4, 12, 30, tzinfo=timezone(timedelta(hours=2)))
+        assert to_epoch_us(aware) == to_epoch_us(datetime(2025, 2, 4, 10, 30))
+    
+    def test_none(self):
+        """Test that None passes through."""
+        assert to_epoch_us(None) is None
+        assert from_epoch_us(None) is None
 
 
 @pytest.mark.unit
@@ -197,6 +245,76 @@ class TestSafeJsonLoads:
         assert result is None
 
 
+@pytest.fixture(params=["orjson", "json"])
+def json_backend(request, monkeypatch):
+    """Run a test with orjson, when installed, and with the json fallback."""
+    if request.param == "json":
+        monkeypatch.setattr(utils_module, "orjson", None)
+    elif utils_module.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+@pytest.mark.unit
+class TestJsonCodec:
+    """Tests for json_dumps and json_loads functions."""
+    
+    def test_round_trip(self, json_backend):
+        """Test that values survive an encode/decode round trip."""
+        value = {"text": "caf\u00e9", "items": [1, 2.5, None, True], "nested": {}}
+        assert json_loads(json_dumps(value)) == value
+    
+    def test_compact_output(self, json_backend):
+        """Test that output has no insignificant whitespace."""
+        assert json_dumps({"a": [1, 2]}) == '{"a":[1,2]}'
+    
+    def test_non_string_keys(self, json_backend):
+        """Test that integer keys are written as strings, like json.dumps."""
+        assert json_loads(json_dumps({1: "one"})) == {"1": "one"}
+    
+    def test_wide_integers(self, json_backend):
+        """Test integers wider than 64 bits."""
+        assert json_loads(json_dumps(2 ** 70)) == 2 ** 70
+    
+    def test_loads_bytes(self, json_backend):
+        """Test decoding UTF-8 bytes."""
+        assert json_loads(b'{"key": "value"}') == {"key": "value"}
+    
+    def test_loads_nan(self, json_backend):
+        """Test decoding NaN literals written by json.dumps."""
+        assert json_loads(json.dumps([float("inf")])) == [float("inf")]
+    
+    def test_dumps_same_output_on_both_backends(self, json_backend):
+        """Test that types orjson encodes natively match on the json fallback."""
+        value = {
+            "naive": datetime(2025, 2, 4, 10, 30, 0, 5),
+            "aware": datetime(2025, 2, 4, tzinfo=timezone.utc),
+            "date": date(2025, 2, 4),
+            "id": uuid.UUID(int=1),
+        }
+        assert json_dumps(value) == (
+            '{"naive":"2025-02-04T10:30:00.000005",'
+            '"aware":"2025-02-04T00:00:00+00:00",'
+            '"date":"2025-02-04",'
+            '"id":"00000000-0000-0000-0000-000000000001"}'
+        )
+    
+    def test_dumps_non_finite_floats_as_null(self, json_backend):
+        """Test that NaN and infinity are written as null on both backends."""
+        value = {"values": [float("nan"), float("inf"), 1.5]}
+        assert json_dumps(value) == '{"values":[null,null,1.5]}'
+    
+    def test_dumps_unsupported_type(self, json_backend):
+        """Test that values neither backend can encode raise TypeError."""
+        with pytest.raises(TypeError):
+            json_dumps({"value": object()})
+    
+    def test_invalid_json(self, json_backend):
+        """Test that invalid input raises JSONDecodeError."""
+        with pytest.raises(json.JSONDecodeError):
+            json_loads("not json")
+
+
 @pytest.mark.unit
 class TestGetNested:
     """Tests for get_nested function."""
@@ -220,3 +338,21 @@ class TestGetNested:
         """Test getting with non-dict intermediate."""
         data = {"a": "string"}
         assert get_nested(data, "a", "b") is None
+
+
+@pytest.mark.unit
+class TestMakeGetter:
+    """Tests for make_getter function."""
+    
+    @pytest.mark.parametrize("data", [
+        {"a": {"b": {"c": "value"}}},
+        {"a": {"b": {}}},
+        {"a": {"b": {"c": None}}},
+        {"a": "string"},
+        {"a": ["list"]},
+        {},
+    ])
+    def test_matches_get_nested(self, data):
+        """Test that a getter returns what get_nested would."""
+        getter = make_getter("a", "b", "c", default="default")
+        assert getter(data) == get_nested(data, "a", "b", "c", default="default")
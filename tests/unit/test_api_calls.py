@@ -16,6 +16,11 @@ from unittest.mock import patch
 
 import pytest
 
+from tests.helpers.bash_runner import BashRunner
+
+# stop_hook.sh, found relative to the repository root
+SCRIPT_PATH = BashRunner.DEFAULT_SCRIPT_PATH
+
 
 @pytest.mark.unit
 class TestApiCallFunction:
@@ -91,7 +96,7 @@ class TestApiCallErrorHandling:
             ["bash", "-c", script],
             capture_output=True,
             text=True,
-            cwd="/Users/tanushreesharma/tracing-claude-code"
+            cwd=SCRIPT_PATH.parent
         )
 
         source = result.stdout
@@ -111,7 +116,7 @@ class TestApiCallErrorHandling:
             ["bash", "-c", script],
             capture_output=True,
             text=True,
-            cwd="/Users/tanushreesharma/tracing-claude-code"
+            cwd=SCRIPT_PATH.parent
         )
 
         # PATCH uses same structure as POST with -X PATCH
@@ -129,7 +134,7 @@ class TestApiCallErrorHandling:
             ["bash", "-c", script],
             capture_output=True,
             text=True,
-            cwd="/Users/tanushreesharma/tracing-claude-code"
+            cwd=SCRIPT_PATH.parent
         )
 
         source = result.stdout
@@ -248,7 +253,7 @@ class TestCleanupPendingTurn:
 
     def test_cleanup_is_set_as_trap(self):
         """Test that cleanup_pending_turn is set as EXIT trap"""
-        with open("/Users/tanushreesharma/tracing-claude-code/stop_hook.sh", "r") as f:
+        with open(SCRIPT_PATH, "r") as f:
             content = f.read()
 
         # Should have trap set for cleanup
@@ -268,14 +273,14 @@ class TestApiKeyHandling:
 
     def test_api_key_from_cc_langsmith_api_key(self):
         """Test that CC_LANGSMITH_API_KEY is checked first"""
-        with open("/Users/tanushreesharma/tracing-claude-code/stop_hook.sh", "r") as f:
+        with open(SCRIPT_PATH, "r") as f:
             content = f.read()
 
         assert "CC_LANGSMITH_API_KEY" in content
 
     def test_api_key_fallback_to_langsmith_api_key(self):
         """Test fallback to LANGSMITH_API_KEY"""
-        with open("/Users/tanushreesharma/tracing-claude-code/stop_hook.sh", "r") as f:
+        with open(SCRIPT_PATH, "r") as f:
             content = f.read()
 
         # Should have fallback syntax
@@ -283,7 +288,7 @@ class TestApiKeyHandling:
 
     def test_api_key_validation(self):
         """Test that missing API key is handled"""
-        with open("/Users/tanushreesharma/tracing-claude-code/stop_hook.sh", "r") as f:
+        with open(SCRIPT_PATH, "r") as f:
             content = f.read()
 
         # Should check if API_KEY is empty
@@ -306,7 +311,7 @@ class TestHttpResponseHandling:
             ["bash", "-c", script],
             capture_output=True,
             text=True,
-            cwd="/Users/tanushreesharma/tracing-claude-code"
+            cwd=SCRIPT_PATH.parent
         )
 
         source = result.stdout
@@ -326,7 +331,7 @@ class TestHttpResponseHandling:
             ["bash", "-c", script],
             capture_output=True,
             text=True,
-            cwd="/Users/tanushreesharma/tracing-claude-code"
+            cwd=SCRIPT_PATH.parent
         )
 
         source = result.stdout
@@ -346,7 +351,7 @@ class TestHttpResponseHandling:
             ["bash", "-c", script],
             capture_output=True,
             text=True,
-            cwd="/Users/tanushreesharma/tracing-claude-code"
+            cwd=SCRIPT_PATH.parent
         )
 
         source = result.stdout
@@ -365,7 +370,7 @@ class TestHttpResponseHandling:
             ["bash", "-c", script],
             capture_output=True,
             text=True,
-            cwd="/Users/tanushreesharma/tracing-claude-code"
+            cwd=SCRIPT_PATH.parent
         )
 
         source = result.stdout
@@ -381,14 +386,14 @@ class TestProjectConfiguration:
 
     def test_project_name_from_env(self):
         """Test that project name comes from CC_LANGSMITH_PROJECT"""
-        with open("/Users/tanushreesharma/tracing-claude-code/stop_hook.sh", "r") as f:
+        with open(SCRIPT_PATH, "r") as f:
             content = f.read()
 
         assert "CC_LANGSMITH_PROJECT" in content
 
     def test_project_name_default(self):
         """Test that project has default value"""
-        with open("/Users/tanushreesharma/tracing-claude-code/stop_hook.sh", "r") as f:
+        with open(SCRIPT_PATH, "r") as f:
             content = f.read()
 
         # Should have default: "claude-code"
@@ -396,7 +401,7 @@ class TestProjectConfiguration:
 
     def test_api_base_url(self):
         """Test that API base URL is configured"""
-        with open("/Users/tanushreesharma/tracing-claude-code/stop_hook.sh", "r") as f:
+        with open(SCRIPT_PATH, "r") as f:
             content = f.read()
 
         assert "api.smith.langchain.com" in content
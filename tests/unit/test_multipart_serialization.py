@@ -15,6 +15,11 @@ from pathlib import Path
 
 import pytest
 
+from tests.helpers.bash_runner import BashRunner
+
+# stop_hook.sh, found relative to the repository root
+SCRIPT_PATH = BashRunner.DEFAULT_SCRIPT_PATH
+
 
 @pytest.mark.unit
 class TestSerializeForMultipart:
@@ -188,7 +193,7 @@ class TestSerializeForMultipartIntegration:
             ["bash", "-c", script],
             capture_output=True,
             text=True,
-            cwd="/Users/tanushreesharma/tracing-claude-code"
+            cwd=SCRIPT_PATH.parent
         )
 
         # Check output contains -F arguments
@@ -226,7 +231,7 @@ class TestSerializeForMultipartIntegration:
             ["bash", "-c", script],
             capture_output=True,
             text=True,
-            cwd="/Users/tanushreesharma/tracing-claude-code"
+            cwd=SCRIPT_PATH.parent
         )
 
         output = result.stdout
@@ -260,7 +265,7 @@ class TestSerializeForMultipartIntegration:
             ["bash", "-c", script],
             capture_output=True,
             text=True,
-            cwd="/Users/tanushreesharma/tracing-claude-code"
+            cwd=SCRIPT_PATH.parent
         )
 
         # Main file should exist
@@ -296,7 +301,7 @@ class TestSerializeForMultipartIntegration:
             ["bash", "-c", script],
             capture_output=True,
             text=True,
-            cwd="/Users/tanushreesharma/tracing-claude-code"
+            cwd=SCRIPT_PATH.parent
         )
 
         # Read main file and verify it doesn't have inputs/outputs
@@ -332,7 +337,7 @@ class TestSerializeForMultipartIntegration:
             ["bash", "-c", script],
             capture_output=True,
             text=True,
-            cwd="/Users/tanushreesharma/tracing-claude-code"
+            cwd=SCRIPT_PATH.parent
         )
 
         output = result.stdout
@@ -380,7 +385,7 @@ class TestMultipartCurlFormat:
             ["bash", "-c", script],
             capture_output=True,
             text=True,
-            cwd="/Users/tanushreesharma/tracing-claude-code"
+            cwd=SCRIPT_PATH.parent
         )
 
         output = result.stdout
@@ -411,7 +416,7 @@ class TestMultipartCurlFormat:
             ["bash", "-c", script],
             capture_output=True,
             text=True,
-            cwd="/Users/tanushreesharma/tracing-claude-code"
+            cwd=SCRIPT_PATH.parent
         )
 
         output = result.stdout
@@ -441,7 +446,7 @@ class TestMultipartCurlFormat:
             ["bash", "-c", script],
             capture_output=True,
             text=True,
-            cwd="/Users/tanushreesharma/tracing-claude-code"
+            cwd=SCRIPT_PATH.parent
         )
 
         output = result.stdout
@@ -471,7 +476,7 @@ class TestMultipartCurlFormat:
             ["bash", "-c", script],
             capture_output=True,
             text=True,
-            cwd="/Users/tanushreesharma/tracing-claude-code"
+            cwd=SCRIPT_PATH.parent
         )
 
         output = result.stdout
@@ -7,6 +7,8 @@ Tests:
 """
 
 import json
+import threading
+
 import pytest
 
 
@@ -105,3 +107,70 @@ class TestStateManagement:
 
         assert loaded == state
         assert loaded["session_abc"]["metadata"]["model"] == "claude-sonnet-4-5-20250929"
+
+
+@pytest.mark.unit
+class TestStateManagerHelper:
+    """Tests for the StateManager test helper"""
+
+    def test_modifying_returned_state_does_not_leak(self, state_manager, temp_state_file):
+        """Test that dicts passed to save() or returned by load() stay private"""
+        state = {"session_a": {"last_line": 1}}
+        state_manager.save(state)
+
+        # Modify the saved dict and a loaded copy without saving either
+        state["session_a"]["last_line"] = 99
+        state_manager.load()["session_b"] = {"last_line": 5}
+
+        assert state_manager.load() == {"session_a": {"last_line": 1}}
+
+        state_manager.set_turn_count("session_a", 3)
+
+        assert json.loads(temp_state_file.read_text()) == {
+            "session_a": {"last_line": 1, "turn_count": 3}
+        }
+        assert state_manager.load() == {"session_a": {"last_line": 1, "turn_count": 3}}
+
+    def test_transactions_from_threads_do_not_lose_updates(self, state_manager):
+        """Test that each thread's transaction holds the lock for itself"""
+        state_manager.set_turn_count("session_a", 0)
+
+        def increment():
+            for _ in range(20):
+                with state_manager.transaction():
+                    turn_count = state_manager.get_turn_count("session_a")
+                    state_manager.set_turn_count("session_a", turn_count + 1)
+
+        threads = [threading.Thread(target=increment) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert state_manager.get_turn_count("session_a") == 80
+
+    def test_transaction_does_not_overwrite_corrupt_file(self, state_manager, temp_state_file):
+        """Test that a corrupt state file raises inside a transaction"""
+        temp_state_file.write_text("{not json")
+
+        assert state_manager.load() == {}
+        with pytest.raises(json.JSONDecodeError):
+            with state_manager.transaction():
+                state_manager.set_last_line("session_a", 10)
+
+        assert temp_state_file.read_text() == "{not json"
+
+    def test_lockfile_only_for_explicit_transactions(self, state_manager, temp_state_file):
+        """Test that single updates skip the lockfile and clear() removes it"""
+        lock_file = temp_state_file.with_name(temp_state_file.name + ".lock")
+
+        state_manager.set_last_line("session_a", 10)
+        assert not lock_file.exists()
+
+        with state_manager.transaction():
+            state_manager.set_turn_count("session_a", 2)
+        assert lock_file.exists()
+
+        state_manager.clear()
+        assert not temp_state_file.exists()
+        assert not lock_file.exists()
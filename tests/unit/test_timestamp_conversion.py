@@ -13,6 +13,11 @@ import subprocess
 import pytest
 from datetime import datetime
 
+from tests.helpers.bash_runner import BashRunner
+
+# stop_hook.sh, found relative to the repository root
+SCRIPT_PATH = BashRunner.DEFAULT_SCRIPT_PATH
+
 
 @pytest.mark.unit
 class TestISOToDottedOrderConversion:
@@ -162,7 +167,7 @@ class TestDottedOrderTimestampFormat:
             ["bash", "-c", script],
             capture_output=True,
             text=True,
-            cwd="/Users/tanushreesharma/tracing-claude-code"
+            cwd=SCRIPT_PATH.parent
         )
 
         output = result.stdout.strip()
@@ -18,6 +18,11 @@ from datetime import datetime
 
 import pytest
 
+from tests.helpers.bash_runner import BashRunner
+
+# stop_hook.sh, found relative to the repository root
+SCRIPT_PATH = BashRunner.DEFAULT_SCRIPT_PATH
+
 
 @pytest.mark.unit
 class TestCreateTraceFunction:
@@ -251,7 +256,7 @@ class TestFindToolResultWithTimestamp:
             ["bash", "-c", script],
             capture_output=True,
             text=True,
-            cwd="/Users/tanushreesharma/tracing-claude-code"
+            cwd=SCRIPT_PATH.parent
         )
 
         output = json.loads(result.stdout.strip())
@@ -286,7 +291,7 @@ class TestFindToolResultWithTimestamp:
             ["bash", "-c", script],
             capture_output=True,
             text=True,
-            cwd="/Users/tanushreesharma/tracing-claude-code"
+            cwd=SCRIPT_PATH.parent
         )
 
         output = json.loads(result.stdout.strip())
@@ -323,7 +328,7 @@ class TestFindToolResultWithTimestamp:
             ["bash", "-c", script],
             capture_output=True,
             text=True,
-            cwd="/Users/tanushreesharma/tracing-claude-code"
+            cwd=SCRIPT_PATH.parent
         )
 
         output = json.loads(result.stdout.strip())